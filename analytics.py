@@ -0,0 +1,303 @@
+"""機構與住民統計
+
+統計值存放在 analytics_counter 表，於寫入任務、照護計畫、住民時在同一個交易中增量更新，
+查詢時只讀取固定數量的計數列，與歷史資料量無關：
+
+- period = all：目前狀態（住民數、各狀態任務數）
+- period = YYYY-MM：當月事件數（新增任務、完成任務、照護計畫、AI 照護計畫、AI 分析）
+
+逾期任務數依賴查詢當下的時間，改由 (resident_id, status, due_date) 索引只掃描未完成任務。
+刪除住民時，其目前狀態與各月份的計數都會從機構統計中扣除。
+`flask --app app rebuild-analytics` 可由原始資料重建，結果與增量維護一致（AI 分析次數無原始資料，重建時保留）。
+"""
+from collections import defaultdict
+from datetime import datetime
+
+import click
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session, attributes
+
+from events import owner_id_for, soft_deleted
+from models import db, Resident, CareTask, CarePlanHistory, CarePlanArchive, AnalyticsCounter
+
+FACILITY = 'facility'
+RESIDENT = 'resident'
+ALL_TIME = 'all'
+
+TASK_STATUSES = ('pending', 'in_progress', 'completed', 'cancelled')
+OPEN_STATUSES = ('pending', 'in_progress')
+MONTHLY_METRICS = ('tasks_created', 'tasks_completed', 'care_plans', 'ai_care_plans', 'ai_analyses')
+
+# 無法由原始資料重建的指標
+NON_REBUILDABLE_METRICS = ('ai_analyses',)
+
+
+def month_of(value):
+    return (value or datetime.utcnow()).strftime('%Y-%m')
+
+
+def _upsert(table, dialect):
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    statement = insert(table)
+    return statement.on_conflict_do_update(
+        index_elements=[table.c.scope, table.c.scope_id, table.c.period, table.c.metric],
+        set_={'value': table.c.value + statement.excluded.value},
+    )
+
+
+def apply_deltas(connection, deltas):
+    """將 {(scope, scope_id, period, metric): delta} 累加到計數表"""
+    table = AnalyticsCounter.__table__
+    rows = [
+        {'scope': scope, 'scope_id': scope_id, 'period': period, 'metric': metric, 'value': delta}
+        for (scope, scope_id, period, metric), delta in deltas.items()
+        if delta and scope_id is not None
+    ]
+    if not rows:
+        return
+
+    upsert = _upsert(table, connection.dialect.name)
+    if upsert is not None:
+        connection.execute(upsert, rows)
+        return
+
+    for row in rows:
+        key = (table.c.scope == row['scope']) & (table.c.scope_id == row['scope_id']) & \
+              (table.c.period == row['period']) & (table.c.metric == row['metric'])
+        updated = connection.execute(table.update().where(key).values(value=table.c.value + row['value']))
+        if updated.rowcount == 0:
+            connection.execute(table.insert(), row)
+
+
+class _Deltas:
+    def __init__(self, session):
+        self.session = session
+        self.values = defaultdict(int)
+        self.deleted_residents = {}  # 住民 id -> 使用者 id
+
+    def add(self, obj, period, metric, amount=1):
+        owner_id = owner_id_for(self.session, obj)
+        resident_id = obj.id if isinstance(obj, Resident) else obj.resident_id
+        self.values[(FACILITY, owner_id, period, metric)] += amount
+        if not isinstance(obj, Resident):
+            self.values[(RESIDENT, resident_id, period, metric)] += amount
+
+    def remove_resident(self, resident):
+        self.add(resident, ALL_TIME, 'residents', -1)
+        self.deleted_residents[resident.id] = resident.owner_id
+
+    def result(self):
+        # 已刪除住民的計數列會整批移除，不再累加
+        return {
+            key: delta for key, delta in self.values.items()
+            if not (key[0] == RESIDENT and key[1] in self.deleted_residents)
+        }
+
+
+def _task_created(deltas, task):
+    status = task.status or 'pending'
+    deltas.add(task, ALL_TIME, f'tasks_{status}')
+    deltas.add(task, month_of(task.created_at), 'tasks_created')
+    if status == 'completed':
+        deltas.add(task, month_of(task.completed_at), 'tasks_completed')
+
+
+def _task_status_changed(deltas, task):
+    history = attributes.get_history(task, 'status')
+    if not history.added or not history.deleted:
+        return
+    old, new = history.deleted[0], history.added[0]
+    if old == new:
+        return
+    deltas.add(task, ALL_TIME, f'tasks_{old}', -1)
+    deltas.add(task, ALL_TIME, f'tasks_{new}')
+    if new == 'completed':
+        deltas.add(task, month_of(task.completed_at), 'tasks_completed')
+    elif old == 'completed':
+        # 重新開啟的任務不再計入完成數，與 rebuild() 一致
+        completed_at = attributes.get_history(task, 'completed_at')
+        deltas.add(task, month_of(completed_at.deleted[0] if completed_at.deleted else task.completed_at),
+                   'tasks_completed', -1)
+
+
+def _plan_created(deltas, history):
+    deltas.add(history, month_of(history.created_at), 'care_plans')
+    if history.ai_suggestions is not None:
+        deltas.add(history, month_of(history.created_at), 'ai_care_plans')
+
+
+def update_counters(session, flush_context):
+    """after_flush：依本次 flush 的變更累加計數"""
+    deltas = _Deltas(session)
+    for obj in session.new:
+        if isinstance(obj, Resident):
+            deltas.add(obj, ALL_TIME, 'residents')
+        elif isinstance(obj, CareTask):
+            _task_created(deltas, obj)
+        elif isinstance(obj, CarePlanHistory):
+            _plan_created(deltas, obj)
+
+    for obj in session.dirty:
+        if isinstance(obj, CareTask):
+            _task_status_changed(deltas, obj)
+        elif soft_deleted(obj):
+            deltas.remove_resident(obj)
+
+    # 軟刪除時已扣除的住民不再重複扣除
+    for obj in session.deleted:
+        if isinstance(obj, Resident) and obj.deleted_at is None:
+            deltas.remove_resident(obj)
+    for obj in session.deleted:
+        if isinstance(obj, CareTask) and obj.resident_id not in deltas.deleted_residents:
+            deltas.add(obj, ALL_TIME, f'tasks_{obj.status or "pending"}', -1)
+
+    values = deltas.result()
+    if not values and not deltas.deleted_residents:
+        return
+
+    connection = session.connection()
+    if deltas.deleted_residents:
+        _remove_resident_counters(connection, deltas)
+    apply_deltas(connection, deltas.result())
+
+
+def _remove_resident_counters(connection, deltas):
+    """住民的子資料不會載入（passive_deletes），改以其計數列扣除機構計數後移除
+
+    目前狀態與各月份的計數都扣除，與 rebuild() 只計入現存住民的結果一致。
+    """
+    table = AnalyticsCounter.__table__
+    resident_rows = (table.c.scope == RESIDENT) & table.c.scope_id.in_(list(deltas.deleted_residents))
+    current = connection.execute(
+        select(table.c.scope_id, table.c.period, table.c.metric, table.c.value).where(resident_rows)
+    ).all()
+    for resident_id, period, metric, value in current:
+        deltas.values[(FACILITY, deltas.deleted_residents[resident_id], period, metric)] -= value
+    connection.execute(table.delete().where(resident_rows))
+
+
+def record_ai_analysis(owner_id, when=None):
+    """記錄一次 AI 分析（無對應資料列，需由端點明確呼叫），隨目前的交易提交"""
+    apply_deltas(db.session.connection(), {(FACILITY, owner_id, month_of(when), 'ai_analyses'): 1})
+
+
+def recent_months(count, now=None):
+    now = now or datetime.utcnow()
+    year, month = now.year, now.month
+    months = []
+    for _ in range(count):
+        months.append(f'{year:04d}-{month:02d}')
+        month -= 1
+        if month == 0:
+            year, month = year - 1, 12
+    return list(reversed(months))
+
+
+def _counters(scope, scope_id, periods):
+    rows = db.session.query(AnalyticsCounter.period, AnalyticsCounter.metric, AnalyticsCounter.value).filter(
+        AnalyticsCounter.scope == scope,
+        AnalyticsCounter.scope_id == scope_id,
+        AnalyticsCounter.period.in_(periods),
+    ).all()
+    return {(period, metric): value for period, metric, value in rows}
+
+
+def _summary(counters, months, overdue):
+    tasks = {status: counters.get((ALL_TIME, f'tasks_{status}'), 0) for status in TASK_STATUSES}
+    actionable = sum(tasks.values()) - tasks['cancelled']
+    return {
+        'tasks': {
+            'by_status': tasks,
+            'total': sum(tasks.values()),
+            'open': tasks['pending'] + tasks['in_progress'],
+            'overdue': overdue,
+            'completion_rate': round(tasks['completed'] / actionable, 4) if actionable else None,
+        },
+        'monthly': {
+            metric: {month: counters.get((month, metric), 0) for month in months}
+            for metric in MONTHLY_METRICS
+        },
+    }
+
+
+def _overdue_query(now):
+    return db.session.query(func.count(CareTask.id)).filter(
+        CareTask.status.in_(OPEN_STATUSES),
+        CareTask.due_date < now,
+    )
+
+
+def facility_summary(owner_id, months=12):
+    periods = recent_months(months)
+    counters = _counters(FACILITY, owner_id, periods + [ALL_TIME])
+    overdue = _overdue_query(datetime.utcnow()).join(Resident).filter(Resident.owner_id == owner_id).scalar()
+    result = _summary(counters, periods, overdue)
+    result['residents'] = counters.get((ALL_TIME, 'residents'), 0)
+    return result
+
+
+def resident_summary(resident_id, months=12):
+    periods = recent_months(months)
+    counters = _counters(RESIDENT, resident_id, periods + [ALL_TIME])
+    overdue = _overdue_query(datetime.utcnow()).filter(CareTask.resident_id == resident_id).scalar()
+    result = _summary(counters, periods, overdue)
+    result['resident_id'] = resident_id
+    return result
+
+
+def rebuild(batch_size=5000):
+    """由原始資料重建所有可重建的計數，返回寫入的計數列數"""
+    table = AnalyticsCounter.__table__
+    deltas = defaultdict(int)
+
+    def add(owner_id, resident_id, period, metric):
+        deltas[(FACILITY, owner_id, period, metric)] += 1
+        if resident_id is not None:
+            deltas[(RESIDENT, resident_id, period, metric)] += 1
+
+    for (owner_id,) in db.session.execute(select(Resident.owner_id)).yield_per(batch_size):
+        add(owner_id, None, ALL_TIME, 'residents')
+
+    tasks = select(Resident.owner_id, CareTask.resident_id, CareTask.status, CareTask.created_at,
+                   CareTask.completed_at).join(Resident)
+    for owner_id, resident_id, status, created_at, completed_at in db.session.execute(tasks).yield_per(batch_size):
+        add(owner_id, resident_id, ALL_TIME, f"tasks_{status or 'pending'}")
+        add(owner_id, resident_id, month_of(created_at), 'tasks_created')
+        if status == 'completed':
+            add(owner_id, resident_id, month_of(completed_at), 'tasks_completed')
+
+    plans = select(Resident.owner_id, CarePlanHistory.resident_id, CarePlanHistory.created_at,
+                   CarePlanHistory.ai_suggestions.is_not(None)).join(Resident)
+    archived_plans = select(Resident.owner_id, CarePlanArchive.resident_id, CarePlanArchive.created_at,
+                            CarePlanArchive.has_ai_suggestions).join(Resident)
+    for query in (plans, archived_plans):
+        for owner_id, resident_id, created_at, is_ai in db.session.execute(query).yield_per(batch_size):
+            add(owner_id, resident_id, month_of(created_at), 'care_plans')
+            if is_ai:
+                add(owner_id, resident_id, month_of(created_at), 'ai_care_plans')
+
+    db.session.execute(table.delete().where(table.c.metric.not_in(NON_REBUILDABLE_METRICS)))
+    rows = [
+        {'scope': scope, 'scope_id': scope_id, 'period': period, 'metric': metric, 'value': value}
+        for (scope, scope_id, period, metric), value in deltas.items()
+    ]
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(table.insert(), rows[start:start + batch_size])
+    db.session.commit()
+    return len(rows)
+
+
+def init_analytics(app):
+    if not event.contains(Session, 'after_flush', update_counters):
+        event.listen(Session, 'after_flush', update_counters)
+
+    @app.cli.command('rebuild-analytics')
+    def rebuild_analytics_command():
+        """由原始資料重建統計計數表"""
+        written = rebuild()
+        click.echo(f"Rebuilt {written} analytics counter(s)")
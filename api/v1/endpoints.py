@@ -1,36 +1,73 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, session
+from functools import wraps
 from flask_login import login_required, current_user, login_user, logout_user
 from datetime import datetime, timedelta
 import secrets
 import json
-import requests
 import os
-from google.auth.transport import requests as google_requests
-from google.oauth2 import id_token
+import time
 
-from models import db, User, Resident, CarePlanHistory, CareTask, ShareableLink
+from models import db, User, Resident, CarePlanHistory, CareTask, ShareableLink, RequestProfile
+from metrics import observe_deepseek_call
+from profiling import list_profiles
+from events import Subscription, StreamLimitReached, open_stream, parse_last_event_id
+from replica import use_primary
+from analytics import facility_summary, resident_summary, record_ai_analysis
+from sync import changes_since, decode_cursor, record_tombstone, apply_changes
+import daily_logs
+from archive import next_version, list_history, get_history
+from prompts import PromptBuilder, SECTION_BUDGETS, format_resident_context, resident_context
+from credentials import CredentialsBusy
 
 api_v1 = Blueprint('api_v1', __name__)
 
+def wants_html():
+    """客戶端以 ?format=html 要求由伺服器端渲染 Markdown 欄位"""
+    return request.args.get('format') == 'html'
+
 def api_response(success, data=None, error=None, status_code=200):
     """標準化的 API 回應格式"""
     response = {
         "success": success,
-        "timestamp": datetime.utcnow().isoformat(),
+        "timestamp": datetime.utcnow(),
     }
     
     if success:
+        if data is not None and wants_html():
+            # markdown 只在首次要求 HTML 時載入，縮短冷啟動時間
+            from markdown_renderer import attach_html
+            attach_html(data)
         response["data"] = data
     else:
         response["error"] = error
     
     return jsonify(response), status_code
 
+def admin_required(f):
+    """僅限 ADMIN_EMAILS 中的帳號存取"""
+    @wraps(f)
+    @login_required
+    def decorated(*args, **kwargs):
+        if (current_user.email or '').lower() not in current_app.config.get('ADMIN_EMAILS', set()):
+            return api_response(False, error={"message": "Admin access required"}, status_code=403)
+        return f(*args, **kwargs)
+    return decorated
+
+def credentials_busy_response():
+    """密碼雜湊執行緒池已滿時快速回應 503，讓客戶端稍後重試"""
+    response, status_code = api_response(False, error={"message": "Too many sign-in attempts, please retry shortly"},
+                                         status_code=503)
+    response.headers['Retry-After'] = '1'
+    return response, status_code
+
 def call_deepseek_api(messages, max_tokens=2000):
     """調用 DeepSeek API"""
     deepseek_config = current_app.config.get('DEEPSEEK_CLIENT')
     if not deepseek_config:
         raise Exception("DeepSeek API not configured")
+
+    # requests 延遲到首次呼叫時載入，縮短冷啟動時間
+    import requests
     
     payload = {
         "model": "deepseek-chat",
@@ -39,6 +76,8 @@ def call_deepseek_api(messages, max_tokens=2000):
         "temperature": 0.3
     }
     
+    started = time.perf_counter()
+    result = None
     try:
         response = requests.post(
             deepseek_config['base_url'],
@@ -47,11 +86,18 @@ def call_deepseek_api(messages, max_tokens=2000):
             timeout=30
         )
         response.raise_for_status()
-        return response.json()['choices'][0]['message']['content']
+        result = response.json()
+        content = result['choices'][0]['message']['content']
     except Exception as e:
+        # 回應格式錯誤時仍記錄已使用的 token，但只計為一次失敗
+        usage = result.get('usage') if isinstance(result, dict) else None
+        observe_deepseek_call(time.perf_counter() - started, usage, outcome='error')
         current_app.logger.error(f"DeepSeek API error: {str(e)}")
         raise Exception(f"AI service error: {str(e)}")
 
+    observe_deepseek_call(time.perf_counter() - started, result.get('usage'))
+    return content
+
 # --- Authentication API ---
 
 @api_v1.route('/auth/register', methods=['POST'])
@@ -74,6 +120,9 @@ def register():
         db.session.commit()
         login_user(user)
         return api_response(True, data=user.to_dict(), status_code=201)
+    except CredentialsBusy:
+        db.session.rollback()
+        return credentials_busy_response()
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Registration error: {str(e)}")
@@ -90,7 +139,14 @@ def login():
 
     user = User.query.filter_by(email=email).first()
 
-    if user and user.check_password(password):
+    try:
+        valid = user is not None and user.check_password(password)
+    except CredentialsBusy:
+        return credentials_busy_response()
+
+    if valid:
+        # 保存以目前設定重新雜湊的密碼
+        db.session.commit()
         login_user(user)
         return api_response(True, data=user.to_dict())
     
@@ -122,6 +178,10 @@ def google_auth():
         if not google_client_id:
             return api_response(False, error={"message": "Google OAuth not configured"}, status_code=500)
         
+        # google-auth 載入成本高，僅在 Google 登入時匯入
+        from google.auth.transport import requests as google_requests
+        from google.oauth2 import id_token
+
         # 驗證 token
         idinfo = id_token.verify_oauth2_token(
             token, 
@@ -307,7 +367,9 @@ def delete_resident(resident_id):
         if not resident:
             return api_response(False, error={"message": "Resident not found"}, status_code=404)
         
-        db.session.delete(resident)
+        # 離線客戶端透過 /sync 的刪除紀錄得知住民已刪除；子資料由背景工作清除
+        record_tombstone(resident)
+        resident.soft_delete()
         db.session.commit()
         
         return api_response(True, data={"message": "Resident deleted successfully"})
@@ -333,50 +395,78 @@ def analyze():
         if not daily_log:
             return api_response(False, error={"message": "Daily log is required"}, status_code=400)
         
-        # 構建 AI 分析提示
+        # 指定住民時保存記錄，並以累積摘要做增量分析
+        if data.get('resident_id'):
+            resident = Resident.query.filter_by(id=data['resident_id'], owner_id=current_user.id).first()
+            if not resident:
+                return api_response(False, error={"message": "Resident not found"}, status_code=404)
+            daily_logs.add_log(resident, daily_log, author_id=current_user.id)
+            db.session.commit()
+            return analyze_daily_logs(resident)
+        
+        # 構建 AI 分析提示（各區段依 token 預算截斷）
+        prompt = (PromptBuilder()
+            .text("請分析以下住民的日常記錄，並提供專業的照護建議：")
+            .section("住民資訊", format_resident_context(resident_info))
+            .section("今日記錄", daily_log, SECTION_BUDGETS['daily_log'], 'tail')
+            .section("當前照護計畫", current_plan, SECTION_BUDGETS['current_plan'], 'outline')
+            .text("""請提供：
+1. 對今日記錄的專業分析
+2. 需要注意的健康狀況或風險
+3. 具體的照護建議
+4. 建議的後續行動計畫""")
+            .build())
         messages = [
             {
                 "role": "system",
                 "content": "你是一位資深的照護專家，專門分析住民的日常記錄並提供專業的照護建議。請以專業、關懷的語調回應，並使用繁體中文。"
             },
-            {
-                "role": "user",
-                "content": f"""
-請分析以下住民的日常記錄，並提供專業的照護建議：
-
-住民資訊：
-姓名：{resident_info.get('name', '未提供')}
-年齡：{resident_info.get('age', '未提供')}
-醫療狀況：{resident_info.get('medical_conditions', '未提供')}
-當前用藥：{resident_info.get('medications', '未提供')}
-
-今日記錄：
-{daily_log}
-
-當前照護計畫：
-{current_plan if current_plan else '無'}
-
-請提供：
-1. 對今日記錄的專業分析
-2. 需要注意的健康狀況或風險
-3. 具體的照護建議
-4. 建議的後續行動計畫
-"""
-            }
+            {"role": "user", "content": prompt}
         ]
         
         ai_analysis = call_deepseek_api(messages)
+        # 與使用次數在同一個交易中提交
+        record_ai_analysis(current_user.id)
         current_user.increment_usage()
         
         return api_response(True, data={
             "analysis": ai_analysis,
-            "remaining_usage": current_user.get_remaining_usage()
+            "remaining_usage": current_user.remaining_usage_json()
         })
         
     except Exception as e:
+        db.session.rollback()
         current_app.logger.error(f"AI analysis error: {str(e)}")
         return api_response(False, error={"message": f"Analysis failed: {str(e)}"}, status_code=500)
 
+def analyze_daily_logs(resident):
+    """只送出上次分析後的新記錄與累積摘要"""
+    previous = daily_logs.latest_analysis(resident.id)
+    pending = daily_logs.pending_logs(resident.id, previous)
+    logs = daily_logs.within_budget(pending)
+    if not logs:
+        # 沒有新記錄時返回上次的分析，不消耗使用次數
+        return api_response(True, data={
+            "analysis": previous.analysis if previous else None,
+            "analysis_record": previous.to_dict() if previous else None,
+            "new_logs": 0,
+            "has_more_logs": False,
+            "remaining_usage": current_user.remaining_usage_json()
+        })
+
+    ai_response = call_deepseek_api(daily_logs.build_messages(resident, logs, previous))
+    record = daily_logs.save_analysis(resident, logs, ai_response, previous)
+    record_ai_analysis(current_user.id)
+    current_user.increment_usage()
+
+    return api_response(True, data={
+        "analysis": record.analysis,
+        "analysis_record": record.to_dict(),
+        "new_logs": len(logs),
+        "has_more_logs": len(logs) < len(pending) or len(pending) == daily_logs.MAX_LOGS_PER_ANALYSIS,
+        "remaining_usage": current_user.remaining_usage_json()
+    })
+
 @api_v1.route('/generate-care-plan', methods=['POST'])
 @login_required
 def generate_care_plan():
@@ -396,31 +486,13 @@ def generate_care_plan():
         if not resident:
             return api_response(False, error={"message": "Resident not found"}, status_code=404)
         
-        # 構建照護計畫生成提示
-        messages = [
-            {
-                "role": "system",
-                "content": "你是一位資深的照護計畫專家，擅長為安老院住民制定詳細、實用的照護計畫。請以專業格式回應，使用繁體中文。"
-            },
-            {
-                "role": "user",
-                "content": f"""
-基於以下資訊，請為住民制定一份詳細的照護計畫：
-
-住民資訊：
-姓名：{resident.name}
-年齡：{resident.age}
-醫療狀況：{resident.medical_conditions or '無特殊狀況'}
-當前用藥：{resident.medications or '無'}
-房間號碼：{resident.room_number or '未指定'}
-
-AI 分析結果：
-{analysis_result}
-
-額外備註：
-{additional_notes}
-
-請提供一份結構化的照護計畫，包含：
+        # 構建照護計畫生成提示；住民資訊依 updated_at 快取
+        prompt = (PromptBuilder()
+            .text("基於以下資訊，請為住民制定一份詳細的照護計畫：")
+            .section("住民資訊", resident_context(resident))
+            .section("AI 分析結果", analysis_result, SECTION_BUDGETS['analysis_result'], 'middle')
+            .section("額外備註", additional_notes, SECTION_BUDGETS['additional_notes'], 'head')
+            .text("""請提供一份結構化的照護計畫，包含：
 1. 日常生活照護
 2. 醫療照護
 3. 安全措施
@@ -428,9 +500,14 @@ AI 分析結果：
 5. 特殊注意事項
 6. 緊急應對程序
 
-每項都請提供具體、可執行的指導。
-"""
-            }
+每項都請提供具體、可執行的指導。""")
+            .build())
+        messages = [
+            {
+                "role": "system",
+                "content": "你是一位資深的照護計畫專家，擅長為安老院住民制定詳細、實用的照護計畫。請以專業格式回應，使用繁體中文。"
+            },
+            {"role": "user", "content": prompt}
         ]
         
         care_plan = call_deepseek_api(messages, max_tokens=3000)
@@ -445,7 +522,7 @@ AI 分析結果：
             content=care_plan,
             ai_suggestions=analysis_result,
             resident_id=resident_id,
-            version=len(resident.care_plan_history) + 1
+            version=next_version(resident.id)
         )
         
         db.session.add(history)
@@ -456,7 +533,7 @@ AI 分析結果：
         return api_response(True, data={
             "care_plan": care_plan,
             "care_plan_history_id": history.id,
-            "remaining_usage": current_user.get_remaining_usage()
+            "remaining_usage": current_user.remaining_usage_json()
         })
         
     except Exception as e:
@@ -476,7 +553,7 @@ def get_current_care_plan(resident_id):
         
         return api_response(True, data={
             "current_care_plan": resident.current_care_plan,
-            "last_updated": resident.updated_at.isoformat() if resident.updated_at else None
+            "last_updated": resident.updated_at
         })
     except Exception as e:
         current_app.logger.error(f"Get care plan error: {str(e)}")
@@ -506,7 +583,7 @@ def save_care_plan(resident_id):
             title=title,
             content=care_plan,
             resident_id=resident_id,
-            version=len(resident.care_plan_history) + 1
+            version=next_version(resident.id)
         )
         
         db.session.add(history)
@@ -530,8 +607,8 @@ def get_care_plan_history(resident_id):
         if not resident:
             return api_response(False, error={"message": "Resident not found"}, status_code=404)
         
-        history = CarePlanHistory.query.filter_by(resident_id=resident_id).order_by(CarePlanHistory.created_at.desc()).all()
-        return api_response(True, data=[h.to_dict() for h in history])
+        # 已封存的舊版本只列出摘要
+        return api_response(True, data=list_history(resident_id))
     except Exception as e:
         current_app.logger.error(f"Get care plan history error: {str(e)}")
         return api_response(False, error={"message": "Failed to fetch care plan history"}, status_code=500)
@@ -540,19 +617,83 @@ def get_care_plan_history(resident_id):
 @login_required
 def get_care_plan_history_detail(history_id):
     try:
-        history = CarePlanHistory.query.join(Resident).filter(
-            CarePlanHistory.id == history_id,
-            Resident.owner_id == current_user.id
-        ).first()
+        # 已封存的版本會自動解壓縮
+        history = get_history(history_id, current_user.id)
         
         if not history:
             return api_response(False, error={"message": "Care plan history not found"}, status_code=404)
         
-        return api_response(True, data=history.to_dict())
+        return api_response(True, data=history)
     except Exception as e:
         current_app.logger.error(f"Get care plan history detail error: {str(e)}")
         return api_response(False, error={"message": "Failed to fetch care plan history"}, status_code=500)
 
+# --- Daily Logs API ---
+
+@api_v1.route('/residents/<int:resident_id>/daily-logs', methods=['POST'])
+@login_required
+def create_daily_log(resident_id):
+    try:
+        resident = Resident.query.filter_by(id=resident_id, owner_id=current_user.id).first()
+        if not resident:
+            return api_response(False, error={"message": "Resident not found"}, status_code=404)
+
+        data = request.get_json()
+        content = (data.get('content') or '').strip()
+        if not content:
+            return api_response(False, error={"message": "Daily log content is required"}, status_code=400)
+
+        try:
+            logged_at = daily_logs.parse_timestamp(data['logged_at']) if data.get('logged_at') else None
+        except ValueError:
+            return api_response(False, error={"message": "logged_at must be an ISO 8601 date or timestamp"}, status_code=400)
+
+        log = daily_logs.add_log(resident, content, author_id=current_user.id, logged_at=logged_at)
+        db.session.commit()
+        return api_response(True, data=log.to_dict(), status_code=201)
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Create daily log error: {str(e)}")
+        return api_response(False, error={"message": "Failed to create daily log"}, status_code=500)
+
+@api_v1.route('/residents/<int:resident_id>/daily-logs', methods=['GET'])
+@login_required
+def get_daily_logs(resident_id):
+    try:
+        resident = Resident.query.filter_by(id=resident_id, owner_id=current_user.id).first()
+        if not resident:
+            return api_response(False, error={"message": "Resident not found"}, status_code=404)
+
+        try:
+            start = daily_logs.parse_timestamp(request.args['from']) if request.args.get('from') else None
+            end = daily_logs.parse_timestamp(request.args['to']) if request.args.get('to') else None
+        except ValueError:
+            return api_response(False, error={"message": "from and to must be ISO 8601 dates or timestamps"}, status_code=400)
+
+        limit = max(1, min(request.args.get('limit', 100, type=int), 500))
+        logs = daily_logs.logs_in_range(resident.id, start, end, limit)
+        return api_response(True, data=[log.to_dict() for log in logs])
+    except Exception as e:
+        current_app.logger.error(f"Get daily logs error: {str(e)}")
+        return api_response(False, error={"message": "Failed to fetch daily logs"}, status_code=500)
+
+@api_v1.route('/residents/<int:resident_id>/daily-logs/analyze', methods=['POST'])
+@login_required
+def analyze_resident_daily_logs(resident_id):
+    if current_user.get_remaining_usage() <= 0:
+        return api_response(False, error={"message": "Usage limit exceeded. Please upgrade to premium."}, status_code=403)
+
+    try:
+        resident = Resident.query.filter_by(id=resident_id, owner_id=current_user.id).first()
+        if not resident:
+            return api_response(False, error={"message": "Resident not found"}, status_code=404)
+
+        return analyze_daily_logs(resident)
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Daily log analysis error: {str(e)}")
+        return api_response(False, error={"message": f"Analysis failed: {str(e)}"}, status_code=500)
+
 # --- Care Tasks API ---
 
 @api_v1.route('/residents/<int:resident_id>/tasks', methods=['POST'])
@@ -630,6 +771,17 @@ def update_care_task(task_id):
 
 # --- Shareable Links API ---
 
+# 通過分享密碼驗證的連結 id，存於 cookie session；只保留最近的幾個
+SHARE_ACCESS_KEY = 'share_access'
+MAX_REMEMBERED_SHARES = 20
+
+def remember_share_access(link):
+    granted = [link_id for link_id in session.get(SHARE_ACCESS_KEY, []) if link_id != link.id]
+    session[SHARE_ACCESS_KEY] = (granted + [link.id])[-MAX_REMEMBERED_SHARES:]
+
+def has_share_access(link):
+    return link.id in session.get(SHARE_ACCESS_KEY, [])
+
 @api_v1.route('/shares', methods=['POST'])
 @login_required
 def create_shareable_link():
@@ -674,6 +826,9 @@ def create_shareable_link():
             "link": link.to_dict()
         }, status_code=201)
         
+    except CredentialsBusy:
+        db.session.rollback()
+        return credentials_busy_response()
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Create shareable link error: {str(e)}")
@@ -710,12 +865,16 @@ def authenticate_share_access(share_token):
             return api_response(False, error={"message": "Link is invalid or has expired"}, status_code=404)
 
         if link.check_password(password):
+            remember_share_access(link)
+            # 與重新雜湊的密碼一併提交
             link.increment_access()
             # TODO: 未來實現 JWT token
             return api_response(True, data={"message": "Authentication successful"})
         else:
             return api_response(False, error={"message": "Incorrect password"}, status_code=401)
             
+    except CredentialsBusy:
+        return credentials_busy_response()
     except Exception as e:
         current_app.logger.error(f"Authenticate share access error: {str(e)}")
         return api_response(False, error={"message": "Authentication failed"}, status_code=500)
@@ -735,4 +894,143 @@ def get_shared_dashboard_data(share_token):
         })
     except Exception as e:
         current_app.logger.error(f"Get shared dashboard error: {str(e)}")
-        return api_response(False, error={"message": "Failed to fetch shared dashboard"}, status_code=500) 
\ No newline at end of file
+        return api_response(False, error={"message": "Failed to fetch shared dashboard"}, status_code=500) 
+
+# --- Offline Sync API ---
+
+@api_v1.route('/sync', methods=['GET'])
+@use_primary
+@login_required
+def sync_changes():
+    try:
+        cursor = decode_cursor(request.args.get('since'))
+    except ValueError:
+        return api_response(False, error={"message": "Invalid sync cursor"}, status_code=400)
+
+    try:
+        config = current_app.config
+        limit = max(1, min(request.args.get('limit', config['SYNC_PAGE_SIZE'], type=int), config['SYNC_PAGE_SIZE']))
+        return api_response(True, data=changes_since(
+            current_user.id, cursor, limit,
+            config['SYNC_SAFETY_SECONDS'], config['SYNC_TOMBSTONE_RETENTION_DAYS'],
+        ))
+    except Exception as e:
+        current_app.logger.error(f"Sync changes error: {str(e)}")
+        return api_response(False, error={"message": "Failed to fetch changes"}, status_code=500)
+
+@api_v1.route('/sync', methods=['POST'])
+@login_required
+def upload_changes():
+    data = request.get_json(silent=True) or {}
+    changes = data.get('changes')
+    if not isinstance(changes, list) or not changes:
+        return api_response(False, error={"message": "Changes are required"}, status_code=400)
+    if len(changes) > current_app.config['SYNC_MAX_UPLOAD']:
+        return api_response(False, error={"message": f"At most {current_app.config['SYNC_MAX_UPLOAD']} changes per upload"}, status_code=413)
+
+    try:
+        applied, conflicts, rejected = apply_changes(current_user.id, changes)
+        return api_response(True, data={
+            "applied": applied,
+            "conflicts": conflicts,
+            "rejected": rejected
+        })
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Upload changes error: {str(e)}")
+        return api_response(False, error={"message": "Failed to apply changes"}, status_code=500)
+
+# --- Change Feed (SSE) API ---
+
+def last_event_id():
+    """EventSource 重連時帶 Last-Event-ID 標頭；也接受 ?last_event_id= 參數"""
+    return parse_last_event_id(request.headers.get('Last-Event-ID') or request.args.get('last_event_id'))
+
+def stream_limit_response():
+    """串流數已達上限時回應 503，客戶端應在 Retry-After 秒後重新連線"""
+    response, status_code = api_response(False, error={"message": "Too many open event streams, please retry later"},
+                                         status_code=503)
+    response.headers['Retry-After'] = str(max(1, int(current_app.config['EVENTS_HEARTBEAT'])))
+    return response, status_code
+
+@api_v1.route('/events', methods=['GET'])
+@use_primary
+@login_required
+def stream_events():
+    try:
+        return open_stream(Subscription(owner_id=current_user.id), last_event_id())
+    except StreamLimitReached:
+        return stream_limit_response()
+    except Exception as e:
+        current_app.logger.error(f"Event stream error: {str(e)}")
+        return api_response(False, error={"message": "Failed to open event stream"}, status_code=500)
+
+@api_v1.route('/shares/<string:share_token>/events', methods=['GET'])
+@use_primary
+def stream_shared_events(share_token):
+    try:
+        link = ShareableLink.query.filter_by(share_token=share_token, is_active=True).first()
+        if not link or link.is_expired():
+            return api_response(False, error={"message": "Link is invalid or has expired"}, status_code=404)
+        if not has_share_access(link):
+            return api_response(False, error={"message": "Share authentication required"}, status_code=401)
+
+        subscription = Subscription(resident_ids=[resident.id for resident in link.residents])
+        return open_stream(subscription, last_event_id())
+    except StreamLimitReached:
+        return stream_limit_response()
+    except Exception as e:
+        current_app.logger.error(f"Shared event stream error: {str(e)}")
+        return api_response(False, error={"message": "Failed to open event stream"}, status_code=500)
+
+# --- Analytics API ---
+
+def analytics_months():
+    return max(1, min(request.args.get('months', 12, type=int), 36))
+
+@api_v1.route('/analytics/facility', methods=['GET'])
+@login_required
+def get_facility_analytics():
+    try:
+        return api_response(True, data=facility_summary(current_user.id, analytics_months()))
+    except Exception as e:
+        current_app.logger.error(f"Get facility analytics error: {str(e)}")
+        return api_response(False, error={"message": "Failed to fetch analytics"}, status_code=500)
+
+@api_v1.route('/analytics/residents/<int:resident_id>', methods=['GET'])
+@login_required
+def get_resident_analytics(resident_id):
+    try:
+        resident = Resident.query.filter_by(id=resident_id, owner_id=current_user.id).first()
+        if not resident:
+            return api_response(False, error={"message": "Resident not found"}, status_code=404)
+
+        return api_response(True, data=resident_summary(resident.id, analytics_months()))
+    except Exception as e:
+        current_app.logger.error(f"Get resident analytics error: {str(e)}")
+        return api_response(False, error={"message": "Failed to fetch analytics"}, status_code=500)
+
+# --- Admin Diagnostics API ---
+
+@api_v1.route('/admin/profiles', methods=['GET'])
+@admin_required
+def get_request_profiles():
+    try:
+        limit = max(1, min(request.args.get('limit', 50, type=int), 200))
+        return api_response(True, data=[profile.to_dict() for profile in list_profiles(limit)])
+    except Exception as e:
+        current_app.logger.error(f"Get request profiles error: {str(e)}")
+        return api_response(False, error={"message": "Failed to fetch request profiles"}, status_code=500)
+
+@api_v1.route('/admin/profiles/<int:profile_id>', methods=['GET'])
+@admin_required
+def get_request_profile(profile_id):
+    try:
+        profile = RequestProfile.query.get(profile_id)
+        if not profile:
+            return api_response(False, error={"message": "Profile not found"}, status_code=404)
+
+        return api_response(True, data=profile.to_dict(include_profile=True))
+    except Exception as e:
+        current_app.logger.error(f"Get request profile error: {str(e)}")
+        return api_response(False, error={"message": "Failed to fetch request profile"}, status_code=500)
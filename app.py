@@ -1,9 +1,22 @@
 #!/usr/bin/env python3
 import os
-from flask import Flask, send_from_directory
+from flask import Flask
 from flask_login import LoginManager
 from flask_cors import CORS
 from models import db, User
+from serialization import json_provider_class
+from compression import init_compression
+from static_assets import init_static_assets
+import runtime_profile
+import replica
+from metrics import init_metrics
+from profiling import init_profiling
+from events import init_events
+from analytics import init_analytics
+from sync import init_sync
+from archive import init_archive
+from purge import init_purge
+from credentials import init_credentials
 from datetime import timedelta
 
 # 從新的 Blueprint 檔案中導入 api_v1
@@ -12,7 +25,9 @@ from api.v1.endpoints import api_v1
 def create_app():
     # 檢查是否存在 build 文件夾（生產環境）
     static_folder = 'build' if os.path.exists('build') else 'public'
-    app = Flask(__name__, static_folder=static_folder, static_url_path='/')
+    # 靜態檔案由 static_assets 依啟動時建立的清單提供，不使用 Flask 內建的 static 路由
+    app = Flask(__name__, static_folder=None)
+    app.json = json_provider_class(os.environ.get('JSON_SERIALIZER', 'auto'))(app)
 
     # --- Configuration ---
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
@@ -22,6 +37,11 @@ def create_app():
     if database_url.startswith('postgres://'):
         database_url = database_url.replace('postgres://', 'postgresql://', 1)
     app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    # 連線池與 SQLite PRAGMA 依執行環境設定檔（APP_PROFILE / FLASK_ENV）決定
+    runtime_profile.configure_app(app, database_url)
+    # 唯讀副本（選用）：api_v1 的 GET 請求改由副本讀取
+    replica_url = os.environ.get('DATABASE_REPLICA_URL')
+    replica.configure_app(app, replica_url, runtime_profile.engine_options(replica_url or ''))
     
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['MAX_CONTENT_LENGTH'] = 5 * 1024 * 1024  # 5MB
@@ -32,6 +52,11 @@ def create_app():
     app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
     app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(days=7)
 
+    # 管理員帳號（逗號分隔的 email），可存取 /api/v1/admin/* 診斷端點
+    app.config['ADMIN_EMAILS'] = {
+        email.strip().lower() for email in os.environ.get('ADMIN_EMAILS', '').split(',') if email.strip()
+    }
+
     # --- DeepSeek Client Initialization ---
     deepseek_api_key = os.environ.get('DEEPSEEK_API_KEY')
     if deepseek_api_key:
@@ -49,6 +74,16 @@ def create_app():
 
     # --- Extensions Initialization ---
     db.init_app(app)
+    runtime_profile.init_engines(app, db)
+    replica.init_replica(app, db)
+    init_metrics(app, db)
+    init_profiling(app, db)
+    init_events(app)
+    init_analytics(app)
+    init_sync(app)
+    init_archive(app)
+    init_purge(app)
+    init_credentials(app)
     
     # CORS 配置
     CORS(app, 
@@ -69,17 +104,14 @@ def create_app():
         # For API requests, return 401 Unauthorized
         return {"success": False, "error": {"message": "Authentication required"}}, 401
 
+    # 回應壓縮（gzip / brotli，依 Accept-Encoding 協商）
+    init_compression(app)
+
     # --- Register Blueprints ---
     app.register_blueprint(api_v1, url_prefix='/api/v1')
 
     # --- React Frontend Serving ---
-    @app.route('/', defaults={'path': ''})
-    @app.route('/<path:path>')
-    def serve(path):
-        if path != "" and os.path.exists(os.path.join(app.static_folder, path)):
-            return send_from_directory(app.static_folder, path)
-        else:
-            return send_from_directory(app.static_folder, 'index.html')
+    init_static_assets(app, os.path.join(app.root_path, static_folder))
 
     return app
 
@@ -87,6 +119,7 @@ def create_app():
 app = create_app()
 
 if __name__ == '__main__':
+    # 本地開發伺服器；生產環境請使用 gunicorn -c gunicorn.conf.py app:app
     with app.app_context():
         db.create_all() # 創建資料庫表格
     
@@ -0,0 +1,139 @@
+"""照護計畫歷史封存
+
+超過 CARE_PLAN_ARCHIVE_DAYS 天的照護計畫版本會移到 care_plan_archive 表：摘要欄位保留供列表使用，
+內容與 AI 建議以 zlib 壓縮存放，讀取單一版本時才解壓縮。每位住民最新的版本不封存，
+已刪除（待清除）住民的歷史也不封存。
+搬移以 Core 陳述式分批進行，不經過 ORM 事件，不會產生變更推送或統計異動。
+
+背景工作每 CARE_PLAN_ARCHIVE_INTERVAL_HOURS 小時執行一次（0 表示停用），
+也可手動執行 `flask --app app archive-care-plans`。
+"""
+import json
+import os
+import zlib
+from datetime import datetime, timedelta
+
+import click
+from sqlalchemy import and_, exists, func, insert, select
+from sqlalchemy.orm import aliased
+
+from jobs import PeriodicJob, register_job
+from models import db, Resident, CarePlanHistory, CarePlanArchive
+
+COMPRESSION_LEVEL = 6
+
+
+def compress_payload(content, ai_suggestions):
+    data = json.dumps({'content': content, 'ai_suggestions': ai_suggestions}, ensure_ascii=False)
+    return zlib.compress(data.encode('utf-8'), COMPRESSION_LEVEL)
+
+
+def decompress_payload(payload):
+    return json.loads(zlib.decompress(payload).decode('utf-8'))
+
+
+def _archivable(cutoff, batch_size):
+    newer = aliased(CarePlanHistory)
+    has_newer = exists().where(and_(newer.resident_id == CarePlanHistory.resident_id, newer.id > CarePlanHistory.id))
+    # Core 查詢不經過 hide_deleted_residents，需自行排除已刪除的住民
+    active = select(Resident.id).where(Resident.deleted_at.is_(None))
+    return select(CarePlanHistory.__table__).where(
+        CarePlanHistory.created_at < cutoff,
+        CarePlanHistory.resident_id.in_(active),
+        has_newer,
+    ).order_by(CarePlanHistory.id).limit(batch_size)
+
+
+def archive_batch(cutoff, batch_size):
+    """封存一批舊版本，返回封存筆數；每批各自一個交易"""
+    history = CarePlanHistory.__table__
+    with db.engine.begin() as conn:
+        rows = conn.execute(_archivable(cutoff, batch_size)).all()
+        if not rows:
+            return 0
+        now = datetime.utcnow()
+        conn.execute(insert(CarePlanArchive.__table__), [{
+            'id': row.id,
+            'resident_id': row.resident_id,
+            'title': row.title,
+            'version': row.version,
+            'created_at': row.created_at,
+            'has_ai_suggestions': row.ai_suggestions is not None,
+            'payload': compress_payload(row.content, row.ai_suggestions),
+            'archived_at': now,
+        } for row in rows])
+        conn.execute(history.delete().where(history.c.id.in_([row.id for row in rows])))
+    return len(rows)
+
+
+def archive_old_versions(retention_days, batch_size=500, max_batches=None):
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    total = batches = 0
+    while max_batches is None or batches < max_batches:
+        archived = archive_batch(cutoff, batch_size)
+        total += archived
+        batches += 1
+        if archived < batch_size:
+            break
+    return total
+
+
+# --- Reads ---
+
+def next_version(resident_id):
+    """下一個版本號；以最大版本計算，不載入歷史內容"""
+    current = max(
+        db.session.query(func.max(CarePlanHistory.version)).filter_by(resident_id=resident_id).scalar() or 0,
+        db.session.query(func.max(CarePlanArchive.version)).filter_by(resident_id=resident_id).scalar() or 0,
+    )
+    return current + 1
+
+
+def list_history(resident_id):
+    """完整的歷史列表，由新到舊；已封存的版本只有摘要欄位"""
+    hot = CarePlanHistory.query.filter_by(resident_id=resident_id).all()
+    archived = CarePlanArchive.query.filter_by(resident_id=resident_id).all()
+    entries = [h.to_dict() for h in hot] + [a.to_dict() for a in archived]
+    return sorted(entries, key=lambda entry: (entry['created_at'] or datetime.min, entry['version']), reverse=True)
+
+
+def get_history(history_id, owner_id):
+    """單一版本；已封存時透明地解壓縮內容，找不到時返回 None"""
+    history = CarePlanHistory.query.join(Resident).filter(
+        CarePlanHistory.id == history_id,
+        Resident.owner_id == owner_id
+    ).first()
+    if history:
+        return history.to_dict()
+
+    archived = CarePlanArchive.query.join(Resident).filter(
+        CarePlanArchive.id == history_id,
+        Resident.owner_id == owner_id
+    ).first()
+    if archived:
+        return archived.to_dict(content=decompress_payload(archived.payload))
+    return None
+
+
+def init_archive(app):
+    app.config.setdefault('CARE_PLAN_ARCHIVE_DAYS', int(os.environ.get('CARE_PLAN_ARCHIVE_DAYS', 180)))
+    app.config.setdefault('CARE_PLAN_ARCHIVE_BATCH', int(os.environ.get('CARE_PLAN_ARCHIVE_BATCH', 500)))
+    app.config.setdefault('CARE_PLAN_ARCHIVE_INTERVAL_HOURS',
+                          float(os.environ.get('CARE_PLAN_ARCHIVE_INTERVAL_HOURS', 24)))
+
+    def run(app):
+        archived = archive_old_versions(app.config['CARE_PLAN_ARCHIVE_DAYS'], app.config['CARE_PLAN_ARCHIVE_BATCH'])
+        if archived:
+            app.logger.info(f"Archived {archived} care plan version(s)")
+        return archived
+
+    job = PeriodicJob('care-plan-archive', run, app.config['CARE_PLAN_ARCHIVE_INTERVAL_HOURS'] * 3600)
+    register_job(app, job)
+
+    @app.cli.command('archive-care-plans')
+    @click.option('--days', type=int, help='Archive versions older than this many days')
+    def archive_care_plans_command(days):
+        """將舊的照護計畫版本移到壓縮封存表"""
+        retention = days if days is not None else app.config['CARE_PLAN_ARCHIVE_DAYS']
+        archived = archive_old_versions(retention, app.config['CARE_PLAN_ARCHIVE_BATCH'])
+        click.echo(f"Archived {archived} care plan version(s) older than {retention} day(s)")
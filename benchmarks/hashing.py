@@ -0,0 +1,109 @@
+"""密碼驗證微基準測試
+
+量測各雜湊設定每秒可完成的驗證次數：先在單一執行緒直接計算（即每核心的上限），再經由
+credentials.PasswordHasher 的執行緒池，以兩倍於執行緒數的並行請求量測吞吐量、延遲與
+因執行緒池已滿而被拒絕的次數。用來挑選 PASSWORD_HASH_METHOD 與 CREDENTIAL_WORKERS。
+
+    python -m benchmarks.hashing
+    python -m benchmarks.hashing --method pbkdf2:sha256:600000 --method pbkdf2:sha256:1000000 --workers 1 2 4
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import statistics
+import threading
+import time
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from credentials import DEFAULT_METHOD, CredentialsBusy, PasswordHasher, canonical_method
+
+PASSWORD = 'benchmark-password'
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(len(ordered) * pct / 100) - 1))]
+
+
+def measure_inline(stored, seconds):
+    count = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        check_password_hash(stored, PASSWORD)
+        count += 1
+    return count / seconds
+
+
+def measure_pool(method, stored, workers, seconds):
+    hasher = PasswordHasher(method, workers=workers, queue_limit=workers * 4, timeout=60)
+    latencies, rejected = [], [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def client():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                hasher.verify(stored, PASSWORD)
+            except CredentialsBusy:
+                with lock:
+                    rejected[0] += 1
+                continue
+            with lock:
+                latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    clients = [threading.Thread(target=client) for _ in range(workers * 2)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    hasher._executor.shutdown()
+
+    throughput = len(latencies) / elapsed
+    return {
+        'workers': workers,
+        'verifications_per_second': round(throughput, 1),
+        'per_core': round(throughput / min(workers, multiprocessing.cpu_count()), 1),
+        'latency_ms': {
+            'p50': round(statistics.median(latencies), 1) if latencies else None,
+            'p95': round(percentile(latencies, 95), 1) if latencies else None,
+        },
+        'rejected': rejected[0],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure password verification throughput.')
+    parser.add_argument('--method', action='append', help='Werkzeug hash method (repeatable)')
+    parser.add_argument('--workers', type=int, nargs='+', help='Executor sizes to measure')
+    parser.add_argument('--seconds', type=float, default=3.0, help='Duration of each measurement')
+    parser.add_argument('--output', help='Write JSON results to this file')
+    args = parser.parse_args(argv)
+
+    cores = multiprocessing.cpu_count()
+    workers = args.workers or sorted({1, 2, cores})
+    results = {'cpu_count': cores, 'methods': []}
+    for method in args.method or [DEFAULT_METHOD]:
+        method = canonical_method(method)
+        stored = generate_password_hash(PASSWORD, method=method)
+        results['methods'].append({
+            'method': method,
+            'inline_per_core': round(measure_inline(stored, args.seconds), 1),
+            'executor': [measure_pool(method, stored, size, args.seconds) for size in workers],
+        })
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,404 @@
+"""端對端負載基準測試
+
+逐一驅動 api_v1 的每個路由，量測吞吐量與 p50/p95/p99 延遲，結果輸出為 JSON，
+方便比較不同 commit。DeepSeek 由本機 HTTP 替身取代，Google ID Token 驗證以 mock 略過。
+
+    python -m benchmarks.seed --database-url sqlite:////tmp/bench.db --residents-per-user 2000
+    python -m benchmarks.load --database-url sqlite:////tmp/bench.db --output before.json
+    python -m benchmarks.load --database-url sqlite:////tmp/bench.db --compare before.json
+
+寫入型路由會改動資料（新增歷史版本、任務等），比較前後結果時請使用相同的全新種子資料庫。
+SSE 串流量測到第一段內容送達的時間。未以 --routes 篩選時，若有 api_v1 路由沒有對應情境，
+執行結束後以非零狀態結束，新增路由時需一併加入情境。
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import secrets
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+from benchmarks.seed import BENCHMARK_PASSWORD
+
+# 每個工作執行緒在 sync.upload 中輪流修改的任務數
+SYNC_TASKS_PER_WORKER = 20
+
+
+class Scenario:
+    """單一路由的請求樣板
+
+    prepare 在延遲計時外執行，返回值傳給 path / body；其耗時仍計入吞吐量的牆鐘時間。
+    """
+
+    def __init__(self, name, method, path, body=None, prepare=None, login=True, stream=False, check=None):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.body = body
+        self.prepare = prepare
+        self.login = login
+        # SSE 串流：量測到第一段內容送達的時間後即關閉連線
+        self.stream = stream
+        # 檢查成功回應的內容，返回 False 時計為錯誤（例如 200 但沒有套用任何修改）
+        self.check = check
+
+
+class BenchContext:
+    """一個工作執行緒的狀態：已登入的 client 與可用的資料 id"""
+
+    def __init__(self, app, email, rng):
+        self.client = app.test_client()
+        self.email = email
+        self.rng = rng
+        self.resident_ids = []
+        self.task_ids = []
+        # sync.upload 專用的任務 id -> updated_at，各工作執行緒互不重疊，避免彼此造成衝突
+        self.sync_tasks = {}
+        self.history_ids = []
+        self.share_tokens = []
+        self.profile_ids = []
+        self.authenticated_shares = set()
+
+    def login(self):
+        response = self.client.post('/api/v1/auth/login', json={'email': self.email, 'password': BENCHMARK_PASSWORD})
+        if response.status_code != 200:
+            raise RuntimeError(f"Benchmark login failed for {self.email}: {response.status_code}")
+
+    def resident(self):
+        return self.rng.choice(self.resident_ids)
+
+    def create_resident(self):
+        response = self.client.post('/api/v1/residents', json={'name': 'Benchmark 暫存住民'})
+        return response.get_json()['data']['id']
+
+    def authenticated_share(self):
+        """通過分享密碼驗證的連結（驗證結果存於此 client 的 session）"""
+        token = self.rng.choice(self.share_tokens)
+        if token not in self.authenticated_shares:
+            self.client.post(f'/api/v1/shares/{token}/authenticate', json={'password': BENCHMARK_PASSWORD})
+            self.authenticated_shares.add(token)
+        return token
+
+    def sync_upload(self):
+        task_id = self.rng.choice(list(self.sync_tasks))
+        return {'changes': [{
+            'op': 'update', 'entity': 'care_task', 'id': task_id, 'base_updated_at': self.sync_tasks[task_id],
+            'data': {'status': self.rng.choice(['pending', 'in_progress', 'completed'])},
+        }]}
+
+    def sync_uploaded(self, response):
+        """記下套用後的 updated_at 供下次上傳使用；有衝突或被拒絕的修改時返回 False"""
+        data = response.get_json()['data']
+        for entry in data['applied']:
+            self.sync_tasks[entry['id']] = entry['updated_at']
+        return bool(data['applied']) and not data['conflicts'] and not data['rejected']
+
+
+def _unique_email():
+    return f'bench-new-{secrets.token_hex(6)}@example.com'
+
+
+def build_scenarios():
+    return [
+        Scenario('auth.register', 'POST', lambda ctx, p: '/api/v1/auth/register',
+                 body=lambda ctx, p: {'email': _unique_email(), 'password': BENCHMARK_PASSWORD}, login=False),
+        Scenario('auth.login', 'POST', lambda ctx, p: '/api/v1/auth/login',
+                 body=lambda ctx, p: {'email': ctx.email, 'password': BENCHMARK_PASSWORD}, login=False),
+        Scenario('auth.me', 'GET', lambda ctx, p: '/api/v1/auth/me'),
+        Scenario('auth.logout', 'POST', lambda ctx, p: '/api/v1/auth/logout', prepare=lambda ctx: ctx.login()),
+        Scenario('auth.google', 'POST', lambda ctx, p: '/api/v1/auth/google',
+                 body=lambda ctx, p: {'token': ctx.email}, login=False),
+        Scenario('auth.google_dev', 'POST', lambda ctx, p: '/api/v1/auth/google-dev',
+                 body=lambda ctx, p: {'email': ctx.email}, login=False),
+        Scenario('residents.list', 'GET', lambda ctx, p: '/api/v1/residents'),
+        Scenario('residents.create', 'POST', lambda ctx, p: '/api/v1/residents',
+                 body=lambda ctx, p: {'name': 'Benchmark 新住民', 'age': 80, 'admission_date': '2024-01-01'}),
+        Scenario('residents.get', 'GET', lambda ctx, p: f'/api/v1/residents/{ctx.resident()}'),
+        Scenario('residents.update', 'PUT', lambda ctx, p: f'/api/v1/residents/{ctx.resident()}',
+                 body=lambda ctx, p: {'care_notes': f'更新於 {datetime.utcnow().isoformat()}'}),
+        Scenario('residents.delete', 'DELETE', lambda ctx, p: f'/api/v1/residents/{p}',
+                 prepare=lambda ctx: ctx.create_resident()),
+        Scenario('ai.analyze', 'POST', lambda ctx, p: '/api/v1/analyze',
+                 body=lambda ctx, p: {'daily_log': '今日食慾良好，下午血壓 150/90，夜間起床兩次。',
+                                      'resident_info': {'name': '測試', 'age': 85}}),
+        Scenario('ai.generate_care_plan', 'POST', lambda ctx, p: '/api/v1/generate-care-plan',
+                 body=lambda ctx, p: {'resident_id': ctx.resident(), 'analysis_result': '血壓偏高，需追蹤。'}),
+        Scenario('care_plan.get', 'GET', lambda ctx, p: f'/api/v1/residents/{ctx.resident()}/care-plan'),
+        Scenario('care_plan.save', 'POST', lambda ctx, p: f'/api/v1/residents/{ctx.resident()}/care-plan',
+                 body=lambda ctx, p: {'care_plan': '# 手動計畫\n\n- 每日量測血壓'}),
+        Scenario('care_plan.history', 'GET', lambda ctx, p: f'/api/v1/residents/{ctx.resident()}/care-plan/history'),
+        Scenario('care_plan.history_detail', 'GET',
+                 lambda ctx, p: f'/api/v1/care-plan-history/{ctx.rng.choice(ctx.history_ids)}'),
+        Scenario('ai.analyze_incremental', 'POST', lambda ctx, p: '/api/v1/analyze',
+                 body=lambda ctx, p: {'daily_log': '今日食慾良好，下午血壓 150/90，夜間起床兩次。',
+                                      'resident_id': ctx.resident()}),
+        Scenario('daily_logs.create', 'POST', lambda ctx, p: f'/api/v1/residents/{ctx.resident()}/daily-logs',
+                 body=lambda ctx, p: {'content': '午餐進食一半，午睡一小時。'}),
+        Scenario('daily_logs.list', 'GET',
+                 lambda ctx, p: f'/api/v1/residents/{ctx.resident()}/daily-logs?from=2020-01-01'),
+        Scenario('daily_logs.analyze', 'POST',
+                 lambda ctx, p: f'/api/v1/residents/{ctx.resident()}/daily-logs/analyze'),
+        Scenario('tasks.create', 'POST', lambda ctx, p: f'/api/v1/residents/{ctx.resident()}/tasks',
+                 body=lambda ctx, p: {'tasks': [{'title': '量測血壓', 'due_date': '2030-01-01 09:00'}]}),
+        Scenario('tasks.update', 'PUT', lambda ctx, p: f'/api/v1/tasks/{ctx.rng.choice(ctx.task_ids)}',
+                 body=lambda ctx, p: {'status': ctx.rng.choice(['pending', 'in_progress', 'completed'])}),
+        Scenario('shares.create', 'POST', lambda ctx, p: '/api/v1/shares',
+                 body=lambda ctx, p: {'password': BENCHMARK_PASSWORD, 'resident_ids': ctx.resident_ids[:3]}),
+        Scenario('shares.meta', 'GET', lambda ctx, p: f'/api/v1/shares/{ctx.rng.choice(ctx.share_tokens)}/meta',
+                 login=False),
+        Scenario('shares.authenticate', 'POST',
+                 lambda ctx, p: f'/api/v1/shares/{ctx.rng.choice(ctx.share_tokens)}/authenticate',
+                 body=lambda ctx, p: {'password': BENCHMARK_PASSWORD}, login=False),
+        Scenario('shares.dashboard', 'GET',
+                 lambda ctx, p: f'/api/v1/shares/{ctx.rng.choice(ctx.share_tokens)}/dashboard', login=False),
+        Scenario('sync.download', 'GET', lambda ctx, p: '/api/v1/sync'),
+        Scenario('sync.upload', 'POST', lambda ctx, p: '/api/v1/sync', body=lambda ctx, p: ctx.sync_upload(),
+                 check=lambda ctx, response: ctx.sync_uploaded(response)),
+        Scenario('events.stream', 'GET', lambda ctx, p: '/api/v1/events?last_event_id=0', stream=True),
+        Scenario('events.shared_stream', 'GET', lambda ctx, p: f'/api/v1/shares/{p}/events?last_event_id=0',
+                 prepare=lambda ctx: ctx.authenticated_share(), login=False, stream=True),
+        Scenario('analytics.facility', 'GET', lambda ctx, p: '/api/v1/analytics/facility'),
+        Scenario('analytics.resident', 'GET', lambda ctx, p: f'/api/v1/analytics/residents/{ctx.resident()}'),
+        Scenario('admin.profiles', 'GET', lambda ctx, p: '/api/v1/admin/profiles'),
+        Scenario('admin.profile_detail', 'GET',
+                 lambda ctx, p: f'/api/v1/admin/profiles/{ctx.rng.choice(ctx.profile_ids)}'),
+    ]
+
+
+def route_of(app, method, path):
+    """請求對應的 (endpoint, method)，用來檢查每個 api_v1 路由都有情境"""
+    endpoint, _ = app.url_map.bind('localhost').match(path.split('?', 1)[0], method=method)
+    return endpoint, method
+
+
+def api_routes(app):
+    return {
+        (rule.endpoint, method)
+        for rule in app.url_map.iter_rules() if rule.endpoint.startswith('api_v1.')
+        for method in rule.methods - {'HEAD', 'OPTIONS'}
+    }
+
+
+def percentile(sorted_values, fraction):
+    """nearest-rank 百分位數"""
+    if not sorted_values:
+        return None
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def summarize(latencies, errors, elapsed):
+    ordered = sorted(latencies)
+    to_ms = lambda value: round(value * 1000, 3) if value is not None else None
+    return {
+        'requests': len(ordered),
+        'errors': errors,
+        'throughput_rps': round(len(ordered) / elapsed, 2) if elapsed else None,
+        'latency_ms': {
+            'mean': to_ms(statistics.fmean(ordered)) if ordered else None,
+            'p50': to_ms(percentile(ordered, 0.50)),
+            'p95': to_ms(percentile(ordered, 0.95)),
+            'p99': to_ms(percentile(ordered, 0.99)),
+            'max': to_ms(ordered[-1]) if ordered else None,
+        },
+    }
+
+
+def _send(ctx, scenario, covered=None):
+    prepared = scenario.prepare(ctx) if scenario.prepare else None
+    path = scenario.path(ctx, prepared)
+    body = scenario.body(ctx, prepared) if scenario.body else None
+    if covered is not None:
+        covered.add(route_of(ctx.client.application, scenario.method, path))
+    started = time.perf_counter()
+    if scenario.stream:
+        response = ctx.client.open(path, method=scenario.method, json=body, buffered=False)
+        next(iter(response.response), None)
+    else:
+        response = ctx.client.open(path, method=scenario.method, json=body)
+        response.get_data()
+    elapsed = time.perf_counter() - started
+    response.close()
+    failed = response.status_code >= 400 or (scenario.check is not None and not scenario.check(ctx, response))
+    return elapsed, failed
+
+
+def run_scenario(scenario, contexts, requests_per_route, warmup, covered=None):
+    for ctx in contexts:
+        if scenario.login:
+            ctx.login()
+        for _ in range(warmup):
+            _send(ctx, scenario, covered)
+
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    per_worker = [requests_per_route // len(contexts)] * len(contexts)
+    for index in range(requests_per_route % len(contexts)):
+        per_worker[index] += 1
+
+    def worker(ctx, count):
+        local, local_errors = [], 0
+        for _ in range(count):
+            elapsed, failed = _send(ctx, scenario)
+            local.append(elapsed)
+            if failed:
+                local_errors += 1
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=worker, args=(ctx, count)) for ctx, count in zip(contexts, per_worker)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, errors[0], time.perf_counter() - started)
+
+
+def load_context(ctx, db, slot=0, slots=1):
+    """slot / slots：此 context 在所有工作執行緒中的位置，用來分配 sync.upload 專用的任務"""
+    from models import User, Resident, CarePlanHistory, CareTask, ShareableLink, RequestProfile
+
+    user = User.query.filter_by(email=ctx.email).first()
+    ctx.resident_ids = [row[0] for row in db.session.query(Resident.id).filter_by(owner_id=user.id).limit(5000)]
+    tasks = (db.session.query(CareTask.id, CareTask.updated_at).join(Resident)
+             .filter(Resident.owner_id == user.id).order_by(CareTask.id).limit(5000).all())
+    # 開頭的任務保留給 sync.upload（tasks.update 不會修改），其 updated_at 作為 base_updated_at
+    reserved = SYNC_TASKS_PER_WORKER * slots
+    ctx.sync_tasks = {task_id: (updated_at or datetime.utcnow()).isoformat()
+                      for task_id, updated_at in tasks[slot:reserved:slots]}
+    ctx.task_ids = [task_id for task_id, _ in tasks[reserved:]]
+    ctx.history_ids = [row[0] for row in db.session.query(CarePlanHistory.id).join(Resident)
+                       .filter(Resident.owner_id == user.id).limit(5000)]
+    ctx.share_tokens = [row[0] for row in db.session.query(ShareableLink.share_token).filter_by(created_by=user.id)]
+    ctx.profile_ids = [row[0] for row in db.session.query(RequestProfile.id).limit(200)]
+    if not ctx.profile_ids:
+        # 剖析器預設關閉，放入一筆剖析紀錄供 admin.profile_detail 使用
+        profile = RequestProfile(method='GET', path='/benchmark', endpoint='benchmark', status_code=200,
+                                 duration_ms=0, profile='benchmark')
+        db.session.add(profile)
+        db.session.commit()
+        ctx.profile_ids = [profile.id]
+    if not (ctx.resident_ids and ctx.task_ids and ctx.sync_tasks and ctx.history_ids and ctx.share_tokens):
+        raise RuntimeError(f"Seeded data for {ctx.email} is incomplete; run benchmarks.seed first")
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline):
+    lines = [f"{'route':32} {'p50 ms':>16} {'p95 ms':>16} {'rps':>16}"]
+    for name, current in results['routes'].items():
+        previous = baseline.get('routes', {}).get(name)
+        if not previous:
+            continue
+
+        def cell(old, new):
+            if not old or new is None:
+                return f'{new}'
+            return f'{new} ({(new - old) / old * 100:+.0f}%)'
+
+        lines.append(f"{name:32} "
+                     f"{cell(previous['latency_ms']['p50'], current['latency_ms']['p50']):>16} "
+                     f"{cell(previous['latency_ms']['p95'], current['latency_ms']['p95']):>16} "
+                     f"{cell(previous['throughput_rps'], current['throughput_rps']):>16}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Drive every api_v1 route and report latency percentiles.')
+    parser.add_argument('--database-url', help='Seeded database; defaults to DATABASE_URL')
+    parser.add_argument('--requests', type=int, default=200, help='Timed requests per route')
+    parser.add_argument('--warmup', type=int, default=5, help='Untimed requests per route and worker')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--routes', help='Comma-separated route names or prefixes (e.g. residents,shares.meta)')
+    parser.add_argument('--ai-latency-ms', type=float, default=0, help='Simulated DeepSeek response time')
+    parser.add_argument('--output', help='Write JSON results to this file instead of stdout')
+    parser.add_argument('--compare', help='Baseline JSON file to diff against')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    os.environ.setdefault('GOOGLE_CLIENT_ID', 'benchmark-client-id')
+
+    from app import create_app
+    from models import db, User
+    from benchmarks.stubs import DeepSeekStub, google_token_stub
+
+    app = create_app()
+    app.config['FLASK_ENV'] = 'development'  # 啟用 /auth/google-dev
+    # 每個工作執行緒同時最多開啟一條串流
+    app.config['EVENTS_MAX_STREAMS'] = max(app.config['EVENTS_MAX_STREAMS'], args.concurrency)
+
+    scenarios = build_scenarios()
+    if args.routes:
+        wanted = [name.strip() for name in args.routes.split(',') if name.strip()]
+        scenarios = [s for s in scenarios if any(s.name == w or s.name.startswith(w + '.') for w in wanted)]
+
+    with DeepSeekStub(latency=args.ai_latency_ms / 1000) as deepseek, google_token_stub():
+        app.config['DEEPSEEK_CLIENT'] = deepseek.client_config()
+        with app.app_context():
+            user = User.query.filter(User.email.like('bench-%@example.com'), User.is_premium.is_(True)).first()
+            if user is None:
+                sys.exit("No seeded benchmark user found; run `python -m benchmarks.seed` first")
+            app.config['ADMIN_EMAILS'] = set(app.config['ADMIN_EMAILS']) | {user.email.lower()}
+            rng = random.Random(args.seed)
+            contexts = [BenchContext(app, user.email, random.Random(rng.random())) for _ in range(args.concurrency)]
+            for slot, ctx in enumerate(contexts):
+                load_context(ctx, db, slot, len(contexts))
+
+        results = {
+            'meta': {
+                'commit': git_commit(),
+                'timestamp': datetime.utcnow().isoformat(),
+                'database': app.config['SQLALCHEMY_DATABASE_URI'].split(':', 1)[0],
+                'python': platform.python_version(),
+                'concurrency': args.concurrency,
+                'requests_per_route': args.requests,
+                'ai_latency_ms': args.ai_latency_ms,
+            },
+            'routes': {},
+        }
+        covered = set()
+        for scenario in scenarios:
+            summary = run_scenario(scenario, contexts, args.requests, args.warmup, covered)
+            results['routes'][scenario.name] = summary
+            latency = summary['latency_ms']
+            print(f"{scenario.name:28} {summary['throughput_rps']:>9} rps  p50 {latency['p50']:>9} ms  "
+                  f"p95 {latency['p95']:>9} ms  p99 {latency['p99']:>9} ms  errors {summary['errors']}",
+                  file=sys.stderr)
+
+    output = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            print(compare(results, json.load(f)), file=sys.stderr)
+
+    # 新增的路由必須有對應的情境
+    uncovered = sorted(api_routes(app) - covered)
+    if not args.routes and uncovered:
+        sys.exit('api_v1 routes without a benchmark scenario: '
+                 + ', '.join(f'{method} {endpoint}' for endpoint, method in uncovered))
+
+
+if __name__ == '__main__':
+    main()
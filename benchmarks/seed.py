@@ -0,0 +1,198 @@
+"""合成資料產生器
+
+產生接近真實規模的安老院資料：使用者 × 住民、照護任務、照護計畫歷史版本與分享連結，
+可寫入 SQLite 或 PostgreSQL（依 --database-url 或 DATABASE_URL）。
+
+    python -m benchmarks.seed --users 5 --residents-per-user 2000
+
+所有使用者密碼皆為 BENCHMARK_PASSWORD，並設為 premium，AI 端點不受用量限制。
+"""
+import argparse
+import os
+import random
+import secrets
+import sys
+import time
+from datetime import datetime, timedelta
+
+BENCHMARK_PASSWORD = 'benchmark-password'
+
+SURNAMES = '陳李張黃何林吳劉蔡楊鄭梁謝郭曾羅馮鄧許蕭'
+GIVEN_NAMES = ['美玲', '志明', '淑芬', '國華', '秀英', '建國', '麗華', '家豪', '玉蘭', '文傑', '慧敏', '錦輝']
+CONDITIONS = ['高血壓', '第二型糖尿病', '輕度認知障礙', '骨質疏鬆', '慢性阻塞性肺病', '心房顫動',
+              '退化性關節炎', '帕金森氏症', '中風後遺症', '慢性腎病第三期', '白內障', '憂鬱症']
+MEDICATIONS = ['Amlodipine 5mg 每日一次', 'Metformin 500mg 每日兩次', 'Donepezil 10mg 睡前',
+               'Warfarin 依 INR 調整', 'Calcium + Vit D 每日一次', 'Levodopa 100mg 每日三次',
+               'Atorvastatin 20mg 睡前', 'Omeprazole 20mg 早餐前']
+TASK_TITLES = ['量測血壓', '協助服藥', '翻身拍背', '協助沐浴', '血糖監測', '陪同散步',
+               '傷口換藥', '營養評估', '跌倒風險評估', '家屬聯絡', '復健運動', '口腔清潔']
+PRIORITIES = ['low', 'medium', 'medium', 'high', 'urgent']
+STATUSES = ['pending', 'pending', 'in_progress', 'completed', 'completed', 'completed', 'cancelled']
+PLAN_SECTIONS = ['日常生活照護', '醫療照護', '安全措施', '社交與娛樂活動', '特殊注意事項', '緊急應對程序']
+
+
+def care_plan_text(rng, name):
+    """產生數 KB 的 Markdown 照護計畫，貼近 DeepSeek 的輸出"""
+    lines = [f'# {name} 照護計畫', '']
+    for section in PLAN_SECTIONS:
+        lines.append(f'## {section}')
+        for _ in range(rng.randint(4, 8)):
+            lines.append(f'- **{rng.choice(TASK_TITLES)}**：{rng.choice(CONDITIONS)}相關，'
+                         f'每日觀察並記錄，如有異常立即通報護理站。')
+        lines.append('')
+    return '\n'.join(lines)
+
+
+def _chunks(rows, size):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def seed(db, users=2, residents_per_user=500, tasks_per_resident=8, history_per_resident=4,
+         shares_per_user=3, seed_value=42, batch_size=1000, log=print):
+    """以批次 INSERT 寫入資料，返回各表新增的筆數"""
+    from werkzeug.security import generate_password_hash
+    from models import User, Resident, CarePlanHistory, CareTask, ShareableLink, shareable_residents
+
+    rng = random.Random(seed_value)
+    now = datetime.utcnow()
+    # PBKDF2 很慢，所有帳號共用同一個雜湊
+    password_hash = generate_password_hash(BENCHMARK_PASSWORD)
+    run_id = secrets.token_hex(4)
+    counts = dict.fromkeys(['users', 'residents', 'care_tasks', 'care_plan_history', 'shareable_links'], 0)
+
+    def insert(model_or_table, rows):
+        table = getattr(model_or_table, '__table__', model_or_table)
+        for chunk in _chunks(rows, batch_size):
+            db.session.execute(table.insert(), chunk)
+
+    for user_index in range(users):
+        user = User(
+            email=f'bench-{run_id}-{user_index}@example.com',
+            name=f'Benchmark Facility {user_index}',
+            password_hash=password_hash,
+            is_premium=True,
+        )
+        db.session.add(user)
+        db.session.flush()
+        counts['users'] += 1
+
+        started = time.perf_counter()
+        resident_rows = []
+        for _ in range(residents_per_user):
+            name = rng.choice(SURNAMES) + rng.choice(GIVEN_NAMES)
+            created = now - timedelta(days=rng.randint(30, 1500))
+            resident_rows.append({
+                'name': name,
+                'age': rng.randint(65, 102),
+                'gender': rng.choice(['男', '女']),
+                'room_number': f'{rng.randint(1, 6)}{rng.randint(1, 40):02d}',
+                'admission_date': created.date(),
+                'emergency_contact_name': rng.choice(SURNAMES) + rng.choice(GIVEN_NAMES),
+                'emergency_contact_phone': f'9{rng.randint(0, 9999999):07d}',
+                'medical_conditions': '、'.join(rng.sample(CONDITIONS, rng.randint(1, 4))),
+                'medications': '\n'.join(rng.sample(MEDICATIONS, rng.randint(1, 5))),
+                'care_notes': '需協助行走，夜間易醒。' * rng.randint(1, 5),
+                'current_care_plan': care_plan_text(rng, name),
+                'created_at': created,
+                'updated_at': created + timedelta(days=rng.randint(0, 29)),
+                'owner_id': user.id,
+            })
+        insert(Resident, resident_rows)
+        resident_ids = [row[0] for row in db.session.query(Resident.id).filter_by(owner_id=user.id).all()]
+        counts['residents'] += len(resident_ids)
+
+        task_rows = []
+        history_rows = []
+        for resident_id in resident_ids:
+            for _ in range(tasks_per_resident):
+                status = rng.choice(STATUSES)
+                created = now - timedelta(days=rng.randint(0, 120), hours=rng.randint(0, 23))
+                task_rows.append({
+                    'title': rng.choice(TASK_TITLES),
+                    'description': f'{rng.choice(CONDITIONS)}照護：依照護計畫執行並記錄。',
+                    'priority': rng.choice(PRIORITIES),
+                    'status': status,
+                    'due_date': created + timedelta(days=rng.randint(-3, 14)),
+                    'completed_at': created + timedelta(hours=rng.randint(1, 48)) if status == 'completed' else None,
+                    'assigned_to': rng.choice(GIVEN_NAMES),
+                    'notes': None,
+                    'created_at': created,
+                    'updated_at': created,
+                    'resident_id': resident_id,
+                })
+            for version in range(1, history_per_resident + 1):
+                created = now - timedelta(days=(history_per_resident - version) * 30 + rng.randint(0, 29))
+                history_rows.append({
+                    'title': f"AI 生成照護計畫 - {created.strftime('%Y-%m-%d %H:%M')}",
+                    'content': care_plan_text(rng, str(resident_id)),
+                    'ai_suggestions': '建議加強夜間巡房並追蹤血壓變化。' * rng.randint(1, 6),
+                    'created_at': created,
+                    'version': version,
+                    'resident_id': resident_id,
+                })
+        insert(CareTask, task_rows)
+        insert(CarePlanHistory, history_rows)
+        counts['care_tasks'] += len(task_rows)
+        counts['care_plan_history'] += len(history_rows)
+
+        for share_index in range(shares_per_user):
+            link = ShareableLink(
+                title=f'家屬儀表板 {share_index}',
+                description='合成測試資料',
+                password_hash=password_hash,
+                expires_date=now + timedelta(days=30),
+                created_by=user.id,
+            )
+            db.session.add(link)
+            db.session.flush()
+            shared = rng.sample(resident_ids, min(len(resident_ids), rng.randint(1, 5)))
+            insert(shareable_residents, [
+                {'shareable_link_id': link.id, 'resident_id': resident_id} for resident_id in shared
+            ])
+            counts['shareable_links'] += 1
+
+        db.session.commit()
+        log(f"user {user_index + 1}/{users}: {len(resident_ids)} residents, {len(task_rows)} tasks, "
+            f"{len(history_rows)} history versions in {time.perf_counter() - started:.1f}s")
+
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Seed synthetic care home data.')
+    parser.add_argument('--database-url', help='Defaults to DATABASE_URL or sqlite:///care_buddy.db')
+    parser.add_argument('--users', type=int, default=2)
+    parser.add_argument('--residents-per-user', type=int, default=500)
+    parser.add_argument('--tasks-per-resident', type=int, default=8)
+    parser.add_argument('--history-per-resident', type=int, default=4)
+    parser.add_argument('--shares-per-user', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+
+    from app import create_app
+    from models import db
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        counts = seed(
+            db,
+            users=args.users,
+            residents_per_user=args.residents_per_user,
+            tasks_per_resident=args.tasks_per_resident,
+            history_per_resident=args.history_per_resident,
+            shares_per_user=args.shares_per_user,
+            seed_value=args.seed,
+            batch_size=args.batch_size,
+            log=lambda message: print(message, file=sys.stderr),
+        )
+    print(', '.join(f'{key}={value}' for key, value in counts.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""冷啟動基準測試
+
+在全新的子行程中以 `python -X importtime` 匯入 app（含 create_app()），
+回報總耗時與最慢的頂層模組，並檢查不應在啟動時載入的重型依賴。
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --runs 5 --max-ms 1500 --output startup.json
+
+違反 --max-ms 或匯入了 LAZY_MODULES 中的模組時以非零狀態結束，可放在 CI 防止退化。
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# 這些模組應在首次使用時才載入
+LAZY_MODULES = (
+    'google.auth',
+    'google.oauth2',
+    'requests',
+    'markdown',
+    'reportlab',
+    'PyPDF2',
+    'cProfile',
+    'pyinstrument',
+)
+
+PROBE = (
+    "import sys, time\n"
+    "started = time.perf_counter()\n"
+    "import app\n"
+    "elapsed = time.perf_counter() - started\n"
+    "print('STARTUP', elapsed, ','.join(sorted(sys.modules)))\n"
+)
+
+
+def parse_importtime(stderr):
+    """解析 -X importtime 輸出，返回 {模組: 累計微秒}（僅直接由 app 觸發的頂層匯入）"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        try:
+            _, cumulative, name = line[len('import time:'):].split('|')
+            depth = (len(name) - len(name.lstrip()) - 1) // 2
+            cumulative = int(cumulative)
+        except ValueError:
+            continue
+        if depth <= 1:
+            modules[name.strip()] = cumulative
+    return modules
+
+
+def measure_once(root):
+    env = dict(os.environ)
+    env.setdefault('DATABASE_URL', 'sqlite://')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE],
+        cwd=root, env=env, capture_output=True, text=True, check=True,
+    )
+    line = next(l for l in result.stdout.splitlines() if l.startswith('STARTUP '))
+    _, elapsed, loaded = line.split(' ', 2)
+    return float(elapsed), set(loaded.split(',')), parse_importtime(result.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure cold start time of the Flask app.')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=15, help='Slowest imports to report')
+    parser.add_argument('--max-ms', type=float, help='Fail when the median startup exceeds this')
+    parser.add_argument('--output', help='Write JSON results to this file')
+    args = parser.parse_args(argv)
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    # 第一次執行會編譯 .pyc，不列入統計
+    measure_once(root)
+
+    timings, loaded, modules = [], set(), {}
+    for _ in range(args.runs):
+        elapsed, loaded, modules = measure_once(root)
+        timings.append(elapsed * 1000)
+
+    eager = sorted(
+        name for name in loaded
+        if any(name == lazy or name.startswith(lazy + '.') for lazy in LAZY_MODULES)
+    )
+    slowest = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:args.top]
+    results = {
+        'runs': args.runs,
+        'startup_ms': {
+            'median': round(statistics.median(timings), 1),
+            'min': round(min(timings), 1),
+            'max': round(max(timings), 1),
+        },
+        'slowest_imports_ms': {name: round(micros / 1000, 1) for name, micros in slowest},
+        'eager_lazy_modules': eager,
+    }
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    print(output)
+
+    failures = []
+    if eager:
+        failures.append(f"modules expected to load lazily were imported at startup: {', '.join(eager)}")
+    if args.max_ms is not None and results['startup_ms']['median'] > args.max_ms:
+        failures.append(f"median startup {results['startup_ms']['median']}ms exceeds {args.max_ms}ms")
+    if failures:
+        sys.exit('\n'.join(failures))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""外部服務替身：本機 DeepSeek HTTP 伺服器與 Google ID Token 驗證"""
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+STUB_COMPLETION = '\n'.join(
+    ['# 照護計畫', ''] + [f'## 第 {i} 節\n- **建議**：依住民狀況調整照護頻率並記錄。' for i in range(1, 7)]
+)
+
+
+class DeepSeekStub:
+    """模擬 DeepSeek chat completions；latency 為每次回應前的等待秒數"""
+
+    def __init__(self, latency=0.0, completion=STUB_COMPLETION):
+        stub = self
+        self.latency = latency
+        self.completion = completion
+        self.calls = 0
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                payload = json.loads(self.rfile.read(length) or b'{}')
+                stub.calls += 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+                prompt_chars = sum(len(message.get('content', '')) for message in payload.get('messages', []))
+                body = json.dumps({
+                    'choices': [{'message': {'role': 'assistant', 'content': stub.completion}}],
+                    'usage': {'prompt_tokens': prompt_chars, 'completion_tokens': len(stub.completion)},
+                }).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f'http://{host}:{port}/v1/chat/completions'
+
+    def client_config(self):
+        """可直接放入 app.config['DEEPSEEK_CLIENT'] 的設定"""
+        return {
+            'api_key': 'stub',
+            'base_url': self.url,
+            'headers': {'Authorization': 'Bearer stub', 'Content-Type': 'application/json'},
+        }
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@contextmanager
+def google_token_stub():
+    """以 token 內容作為 email，略過 Google 憑證驗證"""
+    def verify(token, request, audience):
+        return {'email': token, 'name': 'Google Stub User', 'sub': f'stub-{token}'}
+
+    with mock.patch('google.oauth2.id_token.verify_oauth2_token', side_effect=verify):
+        yield
@@ -0,0 +1,80 @@
+"""回應壓縮
+
+依 Accept-Encoding 協商 brotli / gzip，只壓縮超過門檻的文字型回應。
+住民與照護計畫歷史等回應以文字為主，壓縮率通常可達 5–10 倍。
+
+設定：
+- COMPRESS_MIN_SIZE：壓縮門檻（位元組），預設 1024
+- COMPRESS_GZIP_LEVEL：gzip 壓縮等級，預設 6
+- COMPRESS_BROTLI_QUALITY：brotli 品質，預設 4（動態內容取速度與壓縮率的平衡）
+"""
+import gzip
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # brotli 為選用依賴
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/javascript',
+    'text/html',
+    'text/css',
+    'text/plain',
+    'text/javascript',
+    'image/svg+xml',
+}
+
+
+def supported_encodings():
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def negotiate_encoding(encodings=None):
+    """從 Accept-Encoding 中挑選最佳的可用編碼，無可用時返回 None"""
+    return request.accept_encodings.best_match(encodings or supported_encodings())
+
+
+def compress(body, encoding, config):
+    if encoding == 'br':
+        return brotli.compress(body, quality=config.get('COMPRESS_BROTLI_QUALITY', 4))
+    return gzip.compress(body, compresslevel=config.get('COMPRESS_GZIP_LEVEL', 6))
+
+
+def _should_compress(response, min_size):
+    if response.direct_passthrough or response.is_streamed:
+        return False
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return False
+    if 'Content-Encoding' in response.headers:
+        return False
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return False
+    return (response.content_length or 0) >= min_size
+
+
+def init_compression(app):
+    app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+    app.config.setdefault('COMPRESS_GZIP_LEVEL', 6)
+    app.config.setdefault('COMPRESS_BROTLI_QUALITY', 4)
+
+    @app.after_request
+    def compress_response(response):
+        if not _should_compress(response, app.config['COMPRESS_MIN_SIZE']):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = negotiate_encoding()
+        if not encoding:
+            return response
+
+        response.set_data(compress(response.get_data(), encoding, app.config))
+        response.headers['Content-Encoding'] = encoding
+        if response.get_etag()[0]:
+            # 壓縮後內容不同，強 ETag 須降為弱 ETag
+            response.set_etag(response.get_etag()[0], weak=True)
+        return response
+
+    return app
@@ -0,0 +1,142 @@
+"""密碼雜湊與驗證
+
+PBKDF2 / scrypt 刻意耗費 CPU，交班時段的大量登入若在請求執行緒上直接計算，會佔滿同時
+服務資料請求的 worker。這裡改在每個行程專用、有上限的執行緒池中計算（hashlib 計算期間
+會釋放 GIL）：執行中加排隊的工作超過上限時立即拋出 CredentialsBusy，由端點回應 503。
+
+雜湊演算法與成本由 PASSWORD_HASH_METHOD 設定（Werkzeug 格式，例如 pbkdf2:sha256:1000000；
+scrypt 與 pbkdf2:sha512 的雜湊超過 password_hash 欄位的 128 字元，啟動時即拒絕）。登入驗證成功時，若儲存的雜湊使用舊的參數，會以目前的設定重新雜湊，
+由呼叫端隨同一個交易提交。
+
+設定：
+- PASSWORD_HASH_METHOD：預設 pbkdf2:sha256:600000
+- CREDENTIAL_WORKERS：每個行程的雜湊執行緒數，預設為 CPU 核心數 / gunicorn worker 數（無條件進位）；
+  在預設的 worker 數下為 1
+- CREDENTIAL_QUEUE_LIMIT：可排隊等待的工作數，預設為執行緒數的 4 倍
+- CREDENTIAL_TIMEOUT_SECONDS：請求等待結果的上限，預設 10
+"""
+import hashlib
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from flask import current_app
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+DEFAULT_METHOD = f'pbkdf2:sha256:{DEFAULT_PBKDF2_ITERATIONS}'
+SALT_LENGTH = 16
+# User.password_hash / ShareableLink.password_hash 的欄位長度
+MAX_HASH_LENGTH = 128
+
+
+class CredentialsBusy(Exception):
+    """雜湊執行緒池已滿或等待逾時"""
+
+
+def canonical_method(method):
+    """補齊 Werkzeug 的預設參數，讓設定值可直接與儲存雜湊的前綴比較"""
+    name, *args = method.split(':')
+    if name == 'pbkdf2':
+        hash_name = args[0] if args else 'sha256'
+        iterations = int(args[1]) if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS
+        return f'pbkdf2:{hash_name}:{iterations}'
+    if name == 'scrypt':
+        n, r, p = map(int, args) if args else (2 ** 15, 8, 1)
+        return f'scrypt:{n}:{r}:{p}'
+    raise ValueError(f"Unsupported password hash method: {method}")
+
+
+def hash_length(method):
+    name, *args = method.split(':')
+    digest_size = hashlib.new(args[0]).digest_size if name == 'pbkdf2' else 64
+    return len(method) + SALT_LENGTH + digest_size * 2 + 2
+
+
+def needs_rehash(stored_hash, method):
+    return stored_hash.split('$', 1)[0] != method
+
+
+class PasswordHasher:
+    def __init__(self, method=DEFAULT_METHOD, workers=1, queue_limit=4, timeout=10):
+        self.method = canonical_method(method)
+        if hash_length(self.method) > MAX_HASH_LENGTH:
+            raise ValueError(f"Hashes produced by {self.method} do not fit in {MAX_HASH_LENGTH} characters")
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='credentials')
+        self._slots = threading.BoundedSemaphore(workers + queue_limit)
+
+    def _run(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            raise CredentialsBusy()
+        try:
+            future = self._executor.submit(func, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            # 尚未開始的工作直接取消；已在計算中的會完成後釋放名額
+            future.cancel()
+            raise CredentialsBusy()
+
+    def _hash(self, password):
+        return generate_password_hash(password, method=self.method, salt_length=SALT_LENGTH)
+
+    def _verify(self, stored_hash, password):
+        if not check_password_hash(stored_hash, password):
+            return False, None
+        return True, self._hash(password) if needs_rehash(stored_hash, self.method) else None
+
+    def hash(self, password):
+        return self._run(self._hash, password)
+
+    def verify(self, stored_hash, password):
+        """返回 (是否正確, 新雜湊)；參數已過時時在同一個工作中一併重新雜湊，否則新雜湊為 None"""
+        if not stored_hash or stored_hash.count('$') < 2:
+            # Google 帳號沒有密碼
+            return False, None
+        return self._run(self._verify, stored_hash, password)
+
+
+def default_workers():
+    """每個行程分到的 CPU 核心數，無條件進位
+
+    預設的 worker 數（核心數 × 2 + 1）多於核心數，每個行程一條執行緒時全伺服器的雜湊執行緒
+    就已多於核心數，因此預設為 1；WEB_CONCURRENCY 設得比核心數少時才會分到多條執行緒。
+    """
+    from runtime_profile import worker_count
+    return max(1, math.ceil(multiprocessing.cpu_count() / worker_count()))
+
+
+_fallback = None
+
+
+def get_hasher():
+    """目前 app 的雜湊器；在 app 之外（例如種子腳本）使用預設設定"""
+    global _fallback
+    hasher = current_app.extensions.get('credentials') if current_app else None
+    if hasher is None:
+        if _fallback is None:
+            _fallback = PasswordHasher()
+        hasher = _fallback
+    return hasher
+
+
+def init_credentials(app):
+    app.config.setdefault('PASSWORD_HASH_METHOD', os.environ.get('PASSWORD_HASH_METHOD', DEFAULT_METHOD))
+    app.config.setdefault('CREDENTIAL_WORKERS', int(os.environ.get('CREDENTIAL_WORKERS', default_workers())))
+    app.config.setdefault('CREDENTIAL_QUEUE_LIMIT',
+                          int(os.environ.get('CREDENTIAL_QUEUE_LIMIT', app.config['CREDENTIAL_WORKERS'] * 4)))
+    app.config.setdefault('CREDENTIAL_TIMEOUT_SECONDS', float(os.environ.get('CREDENTIAL_TIMEOUT_SECONDS', 10)))
+
+    # 執行緒在首次雜湊時才建立，gunicorn 主行程 fork 前不會啟動
+    app.extensions['credentials'] = PasswordHasher(
+        app.config['PASSWORD_HASH_METHOD'],
+        workers=app.config['CREDENTIAL_WORKERS'],
+        queue_limit=app.config['CREDENTIAL_QUEUE_LIMIT'],
+        timeout=app.config['CREDENTIAL_TIMEOUT_SECONDS'],
+    )
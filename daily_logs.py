@@ -0,0 +1,123 @@
+"""日常記錄與增量 AI 分析
+
+日常記錄只新增不修改，依 (resident_id, logged_at) 建索引供時間範圍查詢。
+增量分析只送出上次分析之後新增的記錄（依 id，補登的舊日期記錄也會納入），
+加上上次保存的累積摘要；模型同時回傳本次分析與更新後的摘要，提示長度不隨記錄天數成長。
+"""
+from datetime import datetime
+
+from models import db, DailyLog, DailyLogAnalysis
+from prompts import PromptBuilder, SECTION_BUDGETS, estimate_tokens, fit, resident_context
+
+# 單次分析最多納入的新記錄數，其餘留待下次分析
+MAX_LOGS_PER_ANALYSIS = 50
+SUMMARY_MAX_CHARS = 2000
+
+SUMMARY_MARKER = '【累積摘要】'
+ANALYSIS_MARKER = '【分析】'
+
+
+def parse_timestamp(value):
+    """接受 YYYY-MM-DD 或 ISO 8601；格式錯誤時拋出 ValueError"""
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+
+
+def add_log(resident, content, author_id=None, logged_at=None):
+    log = DailyLog(resident_id=resident.id, author_id=author_id, content=content,
+                   logged_at=logged_at or datetime.utcnow())
+    db.session.add(log)
+    return log
+
+
+def logs_in_range(resident_id, start=None, end=None, limit=100):
+    """時間範圍內的記錄，由新到舊；end 不含"""
+    query = DailyLog.query.filter(DailyLog.resident_id == resident_id)
+    if start is not None:
+        query = query.filter(DailyLog.logged_at >= start)
+    if end is not None:
+        query = query.filter(DailyLog.logged_at < end)
+    return query.order_by(DailyLog.logged_at.desc(), DailyLog.id.desc()).limit(limit).all()
+
+
+def latest_analysis(resident_id):
+    return DailyLogAnalysis.query.filter_by(resident_id=resident_id).order_by(DailyLogAnalysis.id.desc()).first()
+
+
+def pending_logs(resident_id, previous):
+    """上次分析之後新增的記錄（最舊的 MAX_LOGS_PER_ANALYSIS 筆），呼叫端再以 within_budget() 篩選"""
+    query = DailyLog.query.filter(DailyLog.resident_id == resident_id)
+    if previous is not None:
+        query = query.filter(DailyLog.id > previous.through_log_id)
+    return query.order_by(DailyLog.id).limit(MAX_LOGS_PER_ANALYSIS).all()
+
+
+def _format_log(log):
+    content = fit(log.content, SECTION_BUDGETS['daily_log_entry'], 'head')
+    return f"[{log.logged_at.strftime('%Y-%m-%d %H:%M')}]\n{content}"
+
+
+def within_budget(logs, budget=None):
+    """依 id 順序取預算內的記錄；未納入的記錄留待下次分析，不會被略過"""
+    budget = budget or SECTION_BUDGETS['daily_logs']
+    selected, used = [], 0
+    for log in logs:
+        cost = estimate_tokens(_format_log(log)) + 1
+        if selected and used + cost > budget:
+            break
+        selected.append(log)
+        used += cost
+    return selected
+
+
+def build_messages(resident, logs, previous):
+    new_logs = '\n\n'.join(_format_log(log) for log in sorted(logs, key=lambda log: (log.logged_at, log.id)))
+    prompt = (PromptBuilder()
+        .text("請根據住民先前的累積摘要與新的日常記錄，提供專業的照護建議。")
+        .section("住民資訊", resident_context(resident))
+        .section("先前的累積摘要", previous.summary if previous else '', SECTION_BUDGETS['summary'], 'tail',
+                 empty='無（首次分析）')
+        .section("新的日常記錄", new_logs)
+        .section("當前照護計畫", resident.current_care_plan, SECTION_BUDGETS['current_plan'], 'outline')
+        .text(f"""請依以下格式回應：
+{ANALYSIS_MARKER}
+1. 對新記錄的專業分析（與先前狀況比較）
+2. 需要注意的健康狀況或風險
+3. 具體的照護建議
+4. 建議的後續行動計畫
+
+{SUMMARY_MARKER}
+整合先前摘要與新記錄的長期狀況摘要，保留趨勢、重要事件與日期，不超過 {SUMMARY_MAX_CHARS // 2} 字。""")
+        .build())
+    return [
+        {
+            "role": "system",
+            "content": "你是一位資深的照護專家，專門分析住民的日常記錄並提供專業的照護建議。請以專業、關懷的語調回應，並使用繁體中文。"
+        },
+        {"role": "user", "content": prompt}
+    ]
+
+
+def split_response(text, previous_summary=None):
+    """拆出分析與更新後的摘要；模型未依格式回應時，以分析內容接續先前摘要"""
+    analysis, marker, summary = text.partition(SUMMARY_MARKER)
+    analysis = analysis.replace(ANALYSIS_MARKER, '', 1).strip()
+    summary = summary.strip()
+    if not marker or not summary:
+        summary = '\n\n'.join(part for part in (previous_summary, analysis) if part)
+    if len(summary) > SUMMARY_MAX_CHARS:
+        # 保留最新的內容
+        summary = summary[-SUMMARY_MAX_CHARS:]
+    return analysis, summary
+
+
+def save_analysis(resident, logs, text, previous):
+    analysis, summary = split_response(text, previous.summary if previous else None)
+    record = DailyLogAnalysis(
+        resident_id=resident.id,
+        through_log_id=max(log.id for log in logs),
+        log_count=len(logs),
+        analysis=analysis,
+        summary=summary,
+    )
+    db.session.add(record)
+    return record
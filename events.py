@@ -0,0 +1,337 @@
+"""變更推送（Server-Sent Events）
+
+Resident、CareTask、CarePlanHistory、DailyLog 的新增／修改／刪除會在同一個交易中寫入
+change_event 表，交易提交後喚醒本行程的推送執行緒。推送執行緒依序讀取新事件並分送給
+訂閱者；其他 gunicorn worker 的提交則透過定期輪詢同一張表取得，作為跨行程通知的替代。
+事件 id 單調遞增，可作為 SSE 的 Last-Event-ID 續傳。
+
+id 在寫入時分配而非提交時：PostgreSQL 上較小的 id 可能在較大的 id 已被讀取後才提交。
+推送執行緒記下讀取時跳過的 id，之後每次輪詢都重新查詢，出現時補送；超過 EVENTS_GAP_SECONDS
+仍未出現的視為已回滾的交易，不再追蹤。補送的事件 id 可能小於連線上已送出的 id。
+
+設定：
+- EVENTS_POLL_INTERVAL：跨 worker 輪詢間隔秒數，預設 1
+- EVENTS_HEARTBEAT：無事件時送出 keep-alive 的間隔秒數，預設 15
+- EVENTS_MAX_STREAM_SECONDS：單一連線最長秒數，到期後由瀏覽器自動重連，預設 300
+- EVENTS_RETENTION_HOURS：事件保留時數，預設 24
+- EVENTS_MAX_STREAMS：每個 worker 同時開啟的串流上限，預設為 GUNICORN_THREADS 的一半（至少 1）
+- EVENTS_GAP_SECONDS：等待跳過的 id 提交的秒數，預設 10
+
+gthread worker 的每條 SSE 連線會佔用一個執行緒直到連線結束（最長 EVENTS_MAX_STREAM_SECONDS），
+因此串流數設有上限，其餘執行緒保留給一般 API 請求；超過上限時回應 503 與 Retry-After。
+"""
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import event, func, insert, select
+from sqlalchemy.orm import Session, attributes
+
+from runtime_profile import worker_threads
+from models import db, Resident, CareTask, CarePlanHistory, DailyLog, ChangeEvent
+
+TRACKED_MODELS = {
+    Resident: 'resident',
+    CareTask: 'care_task',
+    CarePlanHistory: 'care_plan_history',
+    DailyLog: 'daily_log',
+}
+
+BACKLOG_LIMIT = 1000
+POLL_BATCH_SIZE = 500
+SUBSCRIBER_QUEUE_SIZE = 1000
+# 同時追蹤的跳過 id 上限（例如大量回滾造成的長段空缺）
+MAX_TRACKED_GAPS = 1000
+PRUNE_INTERVAL = 600
+
+
+def owner_id_for(session, obj):
+    """變更物件所屬的使用者 id（可在 flush 事件中使用）"""
+    if isinstance(obj, Resident):
+        return obj.owner_id
+    resident = session.identity_map.get(session.identity_key(Resident, obj.resident_id))
+    if resident is not None:
+        return resident.owner_id
+    return session.connection().execute(
+        select(Resident.owner_id).where(Resident.id == obj.resident_id)
+    ).scalar()
+
+
+def soft_deleted(obj):
+    """本次 flush 中被標記為刪除的住民（Resident.soft_delete）"""
+    if not isinstance(obj, Resident):
+        return False
+    added = attributes.get_history(obj, 'deleted_at').added
+    return bool(added) and added[0] is not None
+
+
+def _collect_changes(session):
+    changes = []
+    for action, objects in (('created', session.new), ('updated', session.dirty), ('deleted', session.deleted)):
+        for obj in objects:
+            entity = TRACKED_MODELS.get(type(obj))
+            if entity is None:
+                continue
+            if action == 'updated' and not session.is_modified(obj, include_collections=False):
+                continue
+            changes.append((obj, entity, 'deleted' if action == 'updated' and soft_deleted(obj) else action))
+    return changes
+
+
+def record_changes(session, flush_context):
+    """after_flush：在同一個交易中寫入 change_event"""
+    changes = _collect_changes(session)
+    if not changes:
+        return
+
+    now = datetime.utcnow()
+    rows = [{
+        'created_at': now,
+        'entity': entity,
+        'entity_id': obj.id,
+        'action': action,
+        'resident_id': obj.id if isinstance(obj, Resident) else obj.resident_id,
+        'owner_id': owner_id_for(session, obj),
+    } for obj, entity, action in changes]
+    session.connection().execute(insert(ChangeEvent.__table__), rows)
+    session.info['change_events_pending'] = True
+
+
+def notify_after_commit(session):
+    if session.info.pop('change_events_pending', False):
+        feed.notify()
+
+
+def discard_after_rollback(session, previous_transaction):
+    session.info.pop('change_events_pending', None)
+
+
+class StreamLimitReached(Exception):
+    """本行程的串流數已達 EVENTS_MAX_STREAMS"""
+
+
+class Subscription:
+    """單一 SSE 連線；owner_id 或 resident_ids 決定可見的事件範圍"""
+
+    def __init__(self, owner_id=None, resident_ids=None):
+        self.owner_id = owner_id
+        self.resident_ids = frozenset(resident_ids or ())
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def matches(self, change):
+        if self.owner_id is not None and change['owner_id'] == self.owner_id:
+            return True
+        return change['resident_id'] in self.resident_ids
+
+    def scope_filter(self):
+        if self.owner_id is not None:
+            return ChangeEvent.owner_id == self.owner_id
+        return ChangeEvent.resident_id.in_(self.resident_ids)
+
+
+def _row_to_change(row):
+    return {
+        'id': row.id,
+        'created_at': row.created_at,
+        'entity': row.entity,
+        'entity_id': row.entity_id,
+        'action': row.action,
+        'resident_id': row.resident_id,
+        'owner_id': row.owner_id,
+    }
+
+
+class ChangeFeed:
+    """行程內的發布／訂閱中心，由單一背景執行緒讀取 change_event 並分送"""
+
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.last_id = 0
+        # 小於 last_id 但尚未讀到的 id -> 首次發現的時間（monotonic）
+        self.gaps = {}
+        self.gap_seconds = 10
+
+    def notify(self):
+        self._wake.set()
+
+    def subscribe(self, subscription, limit=None):
+        self._ensure_started()
+        with self._lock:
+            if limit is not None and len(self._subscriptions) >= limit:
+                raise StreamLimitReached()
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, change):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            if not subscription.matches(change):
+                continue
+            try:
+                subscription.queue.put_nowait(change)
+            except queue.Full:
+                # 消費過慢：結束該連線，讓客戶端以 Last-Event-ID 從資料庫續傳
+                subscription.overflowed = True
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            # 在呼叫端的 app context 中同步取得起點，之後的事件都會由背景執行緒送出
+            self.last_id = db.session.query(func.max(ChangeEvent.id)).scalar() or 0
+            app = current_app._get_current_object()
+            self._thread = threading.Thread(target=self._run, args=(app,), name='change-feed', daemon=True)
+            self._thread.start()
+
+    def _poll_gaps(self):
+        """補送之前跳過、現在已提交的事件；等待過久的 id 不再追蹤"""
+        now = time.monotonic()
+        self.gaps = {gap_id: seen for gap_id, seen in self.gaps.items() if now - seen < self.gap_seconds}
+        if not self.gaps:
+            return
+        rows = db.session.execute(
+            select(ChangeEvent.__table__).where(ChangeEvent.id.in_(list(self.gaps))).order_by(ChangeEvent.id)
+        ).all()
+        for row in rows:
+            del self.gaps[row.id]
+            self.publish(_row_to_change(row))
+
+    def _poll(self):
+        self._poll_gaps()
+        rows = db.session.execute(
+            select(ChangeEvent.__table__).where(ChangeEvent.id > self.last_id)
+            .order_by(ChangeEvent.id).limit(POLL_BATCH_SIZE)
+        ).all()
+        now = time.monotonic()
+        for row in rows:
+            missing = range(self.last_id + 1, row.id)[:MAX_TRACKED_GAPS - len(self.gaps)]
+            self.gaps.update(dict.fromkeys(missing, now))
+            self.publish(_row_to_change(row))
+            self.last_id = row.id
+        return len(rows)
+
+    def _prune(self, retention_hours):
+        cutoff = datetime.utcnow() - timedelta(hours=retention_hours)
+        db.session.execute(ChangeEvent.__table__.delete().where(ChangeEvent.created_at < cutoff))
+        db.session.commit()
+
+    def _run(self, app):
+        with app.app_context():
+            poll_interval = app.config['EVENTS_POLL_INTERVAL']
+            self.gap_seconds = app.config['EVENTS_GAP_SECONDS']
+            last_prune = 0
+            while True:
+                self._wake.wait(poll_interval)
+                self._wake.clear()
+                try:
+                    while self._poll() == POLL_BATCH_SIZE:
+                        pass
+                    if time.monotonic() - last_prune > PRUNE_INTERVAL:
+                        self._prune(app.config['EVENTS_RETENTION_HOURS'])
+                        last_prune = time.monotonic()
+                except Exception as e:
+                    app.logger.error(f"Change feed error: {str(e)}")
+                    time.sleep(poll_interval)
+                finally:
+                    # 不在兩次輪詢之間持有交易
+                    db.session.remove()
+
+
+feed = ChangeFeed()
+
+
+def backlog(subscription, last_event_id):
+    """Last-Event-ID 之後、在訂閱範圍內的事件"""
+    rows = db.session.execute(
+        select(ChangeEvent.__table__).where(ChangeEvent.id > last_event_id, subscription.scope_filter())
+        .order_by(ChangeEvent.id).limit(BACKLOG_LIMIT)
+    ).all()
+    return [_row_to_change(row) for row in rows]
+
+
+def _format_event(change):
+    payload = {key: value for key, value in change.items() if key != 'owner_id'}
+    payload['created_at'] = payload['created_at'].isoformat() if payload['created_at'] else None
+    return f"id: {change['id']}\nevent: change\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+def event_stream(subscription, last_event_id=None):
+    """產生 SSE 內容；訂閱須在呼叫前建立，才不會漏掉回補查詢期間的事件"""
+    config = current_app.config
+    heartbeat = config['EVENTS_HEARTBEAT']
+    deadline = time.monotonic() + config['EVENTS_MAX_STREAM_SECONDS']
+    pending = backlog(subscription, last_event_id) if last_event_id is not None else []
+
+    def generate():
+        # 訂閱後、回補查詢前提交的事件會同時出現在佇列中；補送的事件 id 可能較小，不能只比較大小
+        sent = {change['id'] for change in pending}
+        try:
+            yield f"retry: {int(config['EVENTS_POLL_INTERVAL'] * 1000)}\n\n"
+            for change in pending:
+                yield _format_event(change)
+            while time.monotonic() < deadline and not subscription.overflowed:
+                try:
+                    change = subscription.queue.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+                    continue
+                if change['id'] in sent:
+                    continue
+                yield _format_event(change)
+        finally:
+            feed.unsubscribe(subscription)
+
+    return generate()
+
+
+def sse_response(stream):
+    return current_app.response_class(stream, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',  # 關閉反向代理緩衝，事件即時送達
+    })
+
+
+def open_stream(subscription, last_event_id=None):
+    """訂閱並返回 SSE 回應；串流數已達上限時拋出 StreamLimitReached"""
+    feed.subscribe(subscription, current_app.config['EVENTS_MAX_STREAMS'])
+    try:
+        return sse_response(event_stream(subscription, last_event_id))
+    except Exception:
+        feed.unsubscribe(subscription)
+        raise
+
+
+def parse_last_event_id(value):
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+def init_events(app):
+    app.config.setdefault('EVENTS_POLL_INTERVAL', 1.0)
+    app.config.setdefault('EVENTS_HEARTBEAT', 15)
+    app.config.setdefault('EVENTS_MAX_STREAM_SECONDS', 300)
+    app.config.setdefault('EVENTS_RETENTION_HOURS', 24)
+    app.config.setdefault('EVENTS_GAP_SECONDS', 10)
+    app.config.setdefault('EVENTS_MAX_STREAMS', int(os.environ.get('EVENTS_MAX_STREAMS', max(1, worker_threads() // 2))))
+
+    if not event.contains(Session, 'after_flush', record_changes):
+        event.listen(Session, 'after_flush', record_changes)
+        event.listen(Session, 'after_commit', notify_after_commit)
+        event.listen(Session, 'after_soft_rollback', discard_after_rollback)
@@ -0,0 +1,46 @@
+"""gunicorn 設定：gunicorn -c gunicorn.conf.py app:app"""
+import os
+
+# gunicorn 用於正式部署，未指定時使用 production 設定檔（須在匯入 app 之前設定）
+os.environ.setdefault('APP_PROFILE', 'production')
+
+from runtime_profile import worker_count, worker_threads
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# gthread：DeepSeek 呼叫屬 I/O 等待，以執行緒承接並行請求。
+# SSE 串流會佔用執行緒直到連線結束，每個 worker 最多 EVENTS_MAX_STREAMS 條（預設 threads 的一半）
+worker_class = 'gthread'
+workers = worker_count()
+threads = worker_threads()
+
+# DeepSeek 請求逾時為 30 秒，需留出餘裕
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+
+# 定期回收 worker，避免長時間運行的記憶體累積
+max_requests = 2000
+max_requests_jitter = 200
+
+accesslog = '-'
+errorlog = '-'
+
+
+def on_starting(server):
+    # 取代 app.run() 路徑中的 db.create_all()
+    from app import app
+    from models import db
+    with app.app_context():
+        db.create_all()
+    # 在 fork 前建立靜態檔案清單，worker 直接共用
+    app.extensions['static_assets'].scan()
+
+
+def post_fork(server, worker):
+    # on_starting 已在主行程匯入 app；fork 後不可沿用主行程的資料庫連線
+    from app import app
+    from models import db
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
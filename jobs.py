@@ -0,0 +1,84 @@
+"""背景定期工作
+
+gunicorn 的每個 worker 都會載入 app。定期工作在首次請求時啟動執行緒，執行前以檔案鎖
+選出單一 worker 執行，避免多個 worker 重複處理同一批資料；持有鎖的 worker 被回收後，
+其他 worker 會在下一次檢查時接手。
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows：無檔案鎖，每個行程各自執行
+    fcntl = None
+
+from models import db
+
+
+class PeriodicJob:
+    def __init__(self, name, func, interval_seconds, initial_delay=60):
+        self.name = name
+        self.func = func
+        self.interval = interval_seconds
+        self.initial_delay = initial_delay
+        self._thread = None
+        self._lock = threading.Lock()
+        self._lock_file = None
+
+    def _lock_path(self, app):
+        # 同一台機器上不同資料庫的 app 使用不同的鎖
+        digest = hashlib.sha1(str(app.config.get('SQLALCHEMY_DATABASE_URI')).encode()).hexdigest()[:12]
+        return os.path.join(tempfile.gettempdir(), f'care-buddy-{self.name}-{digest}.lock')
+
+    def _acquire(self, app):
+        if fcntl is None:
+            return True
+        if self._lock_file is None:
+            self._lock_file = open(self._lock_path(app), 'a')
+            try:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                self._lock_file.close()
+                self._lock_file = None
+                return False
+        return True
+
+    def start(self, app):
+        if self._thread is not None or self.interval <= 0:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, args=(app,), name=self.name, daemon=True)
+            self._thread.start()
+
+    def run_once(self, app):
+        with app.app_context():
+            try:
+                return self.func(app)
+            finally:
+                db.session.remove()
+
+    def _run(self, app):
+        time.sleep(self.initial_delay)
+        while True:
+            try:
+                if self._acquire(app):
+                    self.run_once(app)
+            except Exception as e:
+                app.logger.error(f"Background job {self.name} error: {str(e)}")
+            time.sleep(self.interval)
+
+
+def register_job(app, job):
+    """首次請求時啟動（不在 import 或 gunicorn 主行程中啟動執行緒）"""
+    app.extensions.setdefault('periodic_jobs', []).append(job)
+
+    @app.before_request
+    def start_periodic_job():
+        job.start(app)
+
+    return job
@@ -0,0 +1,201 @@
+"""伺服器端 Markdown 渲染
+
+DeepSeek 產生的照護計畫與分析皆為 Markdown。此模組將其轉為已清理的 HTML，
+並以內容雜湊做兩層快取（行程內 LRU + 資料庫表），同一份內容只需渲染一次。
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+import markdown
+from flask import current_app
+from markdown.extensions import Extension
+from markdown.treeprocessors import Treeprocessor
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import db, RenderedMarkdown
+
+# 調整擴充套件或清理規則時請遞增，舊的快取項目會自然失效
+RENDERER_VERSION = 1
+
+MARKDOWN_EXTENSIONS = ['tables', 'fenced_code', 'sane_lists']
+
+# API 回應中內容為 Markdown 的欄位，渲染結果會以 `<欄位>_html` 附加
+MARKDOWN_FIELDS = ('current_care_plan', 'content', 'ai_suggestions', 'analysis')
+
+SAFE_URL_SCHEMES = ('http', 'https', 'mailto')
+
+MEMORY_CACHE_SIZE = 512
+
+# SQLite 單一查詢的參數數量有上限，批次查詢時分段
+_LOOKUP_CHUNK_SIZE = 500
+
+_memory_cache = OrderedDict()
+_memory_lock = threading.Lock()
+_local = threading.local()
+
+
+def _is_safe_url(url):
+    # 去除空白與控制字元，避免 "java\tscript:" 之類的繞過
+    compact = ''.join(ch for ch in url if ch > ' ').lower()
+    scheme, sep, _ = compact.partition(':')
+    if not sep or '/' in scheme or '?' in scheme or '#' in scheme:
+        return True  # 相對連結
+    return scheme in SAFE_URL_SCHEMES
+
+
+class _UnsafeUrlStripper(Treeprocessor):
+    def run(self, root):
+        for element in root.iter():
+            for attr in ('href', 'src'):
+                value = element.get(attr)
+                if value is not None and not _is_safe_url(value):
+                    del element.attrib[attr]
+
+
+class SafeHtmlExtension(Extension):
+    """停用原始 HTML 並移除不安全的連結，輸出可直接插入頁面"""
+
+    def extendMarkdown(self, md):
+        md.preprocessors.deregister('html_block')
+        md.inlinePatterns.deregister('html')
+        md.treeprocessors.register(_UnsafeUrlStripper(md), 'unsafe_url_stripper', 0)
+
+
+def _get_markdown():
+    # Markdown 實例非執行緒安全，每個執行緒各自持有一個
+    md = getattr(_local, 'md', None)
+    if md is None:
+        md = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS + [SafeHtmlExtension()])
+        _local.md = md
+    return md
+
+
+def content_hash(text):
+    return hashlib.sha256(f'{RENDERER_VERSION}:{text}'.encode('utf-8')).hexdigest()
+
+
+def _render(text):
+    md = _get_markdown()
+    try:
+        return md.convert(text)
+    finally:
+        md.reset()
+
+
+def _memory_get(digest):
+    with _memory_lock:
+        html = _memory_cache.get(digest)
+        if html is not None:
+            _memory_cache.move_to_end(digest)
+        return html
+
+
+def _memory_put(digest, html):
+    with _memory_lock:
+        _memory_cache[digest] = html
+        _memory_cache.move_to_end(digest)
+        while len(_memory_cache) > MEMORY_CACHE_SIZE:
+            _memory_cache.popitem(last=False)
+
+
+def _insert_ignoring_duplicates(table):
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        return insert(table).on_conflict_do_nothing()
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        return insert(table).on_conflict_do_nothing()
+    return table.insert()
+
+
+def _load_persisted(digests):
+    found = {}
+    digests = list(digests)
+    for start in range(0, len(digests), _LOOKUP_CHUNK_SIZE):
+        chunk = digests[start:start + _LOOKUP_CHUNK_SIZE]
+        rows = db.session.query(RenderedMarkdown.content_hash, RenderedMarkdown.html).filter(
+            RenderedMarkdown.content_hash.in_(chunk)
+        ).all()
+        found.update(rows)
+    return found
+
+
+def _persist(rows):
+    # 使用獨立連線寫入，不影響請求中 session 已載入的物件
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(_insert_ignoring_duplicates(RenderedMarkdown.__table__), rows)
+    except SQLAlchemyError as e:
+        # 快取寫入失敗不影響回應，下次請求會再嘗試
+        current_app.logger.warning(f"Markdown cache persist error: {str(e)}")
+
+
+def render_many(texts):
+    """批次渲染 Markdown，空值原樣返回；持久化快取只查詢一次"""
+    digests = [content_hash(text) if text else None for text in texts]
+
+    found = {}
+    missing = set()
+    for digest in digests:
+        if digest is None or digest in found:
+            continue
+        html = _memory_get(digest)
+        if html is None:
+            missing.add(digest)
+        else:
+            found[digest] = html
+
+    if missing:
+        try:
+            persisted = _load_persisted(missing)
+        except SQLAlchemyError as e:
+            current_app.logger.warning(f"Markdown cache lookup error: {str(e)}")
+            persisted = {}
+
+        new_rows = []
+        for text, digest in zip(texts, digests):
+            if digest is None or digest in found:
+                continue
+            html = persisted.get(digest)
+            if html is None:
+                html = _render(text)
+                new_rows.append({'content_hash': digest, 'html': html})
+            found[digest] = html
+            _memory_put(digest, html)
+
+        if new_rows:
+            _persist(new_rows)
+
+    return [found[digest] if digest else text for text, digest in zip(texts, digests)]
+
+
+def render_markdown(text):
+    """渲染單一 Markdown 文字"""
+    return render_many([text])[0]
+
+
+def _collect_markdown_fields(value, targets):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key in MARKDOWN_FIELDS and isinstance(item, str):
+                targets.append((value, key))
+            else:
+                _collect_markdown_fields(item, targets)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            _collect_markdown_fields(item, targets)
+
+
+def attach_html(data):
+    """為回應資料中所有 Markdown 欄位附加 `<欄位>_html`，可處理巢狀結構"""
+    targets = []
+    _collect_markdown_fields(data, targets)
+    if not targets:
+        return data
+
+    rendered = render_many([record[key] for record, key in targets])
+    for (record, key), html in zip(targets, rendered):
+        record[f'{key}_html'] = html
+    return data
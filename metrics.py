@@ -0,0 +1,239 @@
+"""請求層級的效能指標與 /metrics 端點（Prometheus 文字格式）
+
+- 每個端點 / 方法 / 狀態碼的延遲直方圖
+- 每個請求的 SQL 語句數與累計資料庫時間（SQLAlchemy 引擎事件）
+- DeepSeek 呼叫延遲與 token 用量
+
+指標存放在行程內，gunicorn 多 worker 時每個 worker 各自統計，
+抓取時以 instance 區分或在前端代理彙總。
+
+設定：
+- METRICS_ENABLED：預設開啟
+- METRICS_TOKEN：設定後 /metrics 需帶 `Authorization: Bearer <token>`；production 設定檔未設定時拒絕存取
+"""
+import hmac
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, current_app, g, has_request_context, request
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+DEEPSEEK_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def collect(self):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} counter'
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}'
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # labels -> [各區間計數..., +Inf 計數, 總和]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def collect(self):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} histogram'
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._values.items()]
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else _format_value(float(bound))
+                yield f'{self.name}_bucket{_format_labels(self.labelnames, labels, ("le", le))} {cumulative}'
+            yield f'{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(series[-1])}'
+            yield f'{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}'
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUEST_LATENCY = registry.register(Histogram(
+    'http_request_duration_seconds', 'HTTP request latency in seconds.',
+    ('endpoint', 'method', 'status'),
+))
+REQUEST_DB_QUERIES = registry.register(Histogram(
+    'http_request_db_queries', 'SQL statements executed per HTTP request.',
+    ('endpoint',), buckets=QUERY_COUNT_BUCKETS,
+))
+REQUEST_DB_TIME = registry.register(Histogram(
+    'http_request_db_duration_seconds', 'Cumulative database time per HTTP request in seconds.',
+    ('endpoint',),
+))
+DEEPSEEK_LATENCY = registry.register(Histogram(
+    'deepseek_request_duration_seconds', 'DeepSeek API call latency in seconds.',
+    ('outcome',), buckets=DEEPSEEK_BUCKETS,
+))
+DEEPSEEK_TOKENS = registry.register(Counter(
+    'deepseek_tokens_total', 'DeepSeek tokens consumed.', ('kind',),
+))
+
+
+class RequestStats:
+    """單一請求的統計資料，存放於 g.request_stats"""
+    __slots__ = ('started', 'query_count', 'db_time', 'status')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.db_time = 0.0
+        self.status = None
+
+
+def current_request_stats():
+    if not has_request_context():
+        return None
+    return g.get('request_stats')
+
+
+def observe_deepseek_call(duration, usage=None, outcome='success'):
+    """記錄一次 DeepSeek 呼叫；usage 為 API 回應中的 usage 欄位"""
+    DEEPSEEK_LATENCY.observe(duration, outcome)
+    if usage:
+        DEEPSEEK_TOKENS.inc('prompt', amount=usage.get('prompt_tokens', 0))
+        DEEPSEEK_TOKENS.inc('completion', amount=usage.get('completion_tokens', 0))
+
+
+def _endpoint_label():
+    return request.endpoint or 'unmatched'
+
+
+def _finish_query(conn):
+    started = conn.info['query_start'].pop()
+    stats = current_request_stats()
+    if stats is not None:
+        stats.query_count += 1
+        stats.db_time += time.perf_counter() - started
+
+
+def instrument_engine(engine):
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+        if context is not None:
+            context._metrics_timed = True
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_timed = False
+        _finish_query(conn)
+
+    @event.listens_for(engine, 'handle_error')
+    def handle_error(exception_context):
+        # 執行失敗的語句不會觸發 after_cursor_execute，在此移除其起始時間
+        conn, context = exception_context.connection, exception_context.execution_context
+        if conn is not None and context is not None and getattr(context, '_metrics_timed', False):
+            context._metrics_timed = False
+            _finish_query(conn)
+
+
+def init_metrics(app, db):
+    app.config.setdefault('METRICS_ENABLED', os.environ.get('METRICS_ENABLED', '1') != '0')
+    app.config.setdefault('METRICS_TOKEN', os.environ.get('METRICS_TOKEN'))
+    if not app.config['METRICS_ENABLED']:
+        return
+
+    with app.app_context():
+        for engine in db.engines.values():
+            instrument_engine(engine)
+
+    @app.before_request
+    def start_request_stats():
+        g.request_stats = RequestStats()
+
+    @app.after_request
+    def capture_status(response):
+        stats = g.get('request_stats')
+        if stats is not None:
+            stats.status = response.status_code
+        return response
+
+    @app.teardown_request
+    def record_request_stats(exc):
+        # 在 teardown 記錄，未處理的例外（未經 after_request）也計為 500
+        stats = g.pop('request_stats', None)
+        if stats is None or request.endpoint == 'metrics':
+            return
+        status = stats.status if stats.status is not None and exc is None else 500
+        endpoint = _endpoint_label()
+        REQUEST_LATENCY.observe(time.perf_counter() - stats.started, endpoint, request.method, str(status))
+        REQUEST_DB_QUERIES.observe(stats.query_count, endpoint)
+        REQUEST_DB_TIME.observe(stats.db_time, endpoint)
+
+    @app.route('/metrics', endpoint='metrics')
+    def metrics():
+        token = current_app.config['METRICS_TOKEN']
+        if not token and current_app.config.get('RUNTIME_PROFILE') == 'production':
+            return {"success": False, "error": {"message": "Metrics are disabled until METRICS_TOKEN is set"}}, 403
+        # 以位元組比較：compare_digest 不接受含非 ASCII 字元的字串
+        if token and not hmac.compare_digest(request.headers.get('Authorization', '').encode(),
+                                             f'Bearer {token}'.encode()):
+            return {"success": False, "error": {"message": "Authentication required"}}, 401
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
@@ -1,15 +1,19 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
 import secrets
+import json
 
-db = SQLAlchemy()
+from credentials import get_hasher
+from replica import RoutingSession
+
+# RoutingSession：設定唯讀副本時將 GET 請求的讀取送往副本
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 # Association table for many-to-many relationship between ShareableLink and Resident
 shareable_residents = db.Table('shareable_residents',
-    db.Column('shareable_link_id', db.Integer, db.ForeignKey('shareable_link.id'), primary_key=True),
-    db.Column('resident_id', db.Integer, db.ForeignKey('resident.id'), primary_key=True)
+    db.Column('shareable_link_id', db.Integer, db.ForeignKey('shareable_link.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('resident_id', db.Integer, db.ForeignKey('resident.id', ondelete='CASCADE'), primary_key=True)
 )
 
 class User(UserMixin, db.Model):
@@ -25,15 +29,21 @@ class User(UserMixin, db.Model):
     last_usage_reset = db.Column(db.DateTime, default=datetime.utcnow)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-    # Relationships
-    residents = db.relationship('Resident', backref='owner', lazy=True, cascade='all, delete-orphan')
-    shareable_links = db.relationship('ShareableLink', backref='creator', lazy=True, cascade='all, delete-orphan')
+    # Relationships（子資料由資料庫 ON DELETE CASCADE 刪除，不逐筆載入）
+    residents = db.relationship('Resident', backref='owner', lazy=True, cascade='all, delete-orphan',
+                                passive_deletes=True)
+    shareable_links = db.relationship('ShareableLink', backref='creator', lazy=True, cascade='all, delete-orphan',
+                                      passive_deletes=True)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = get_hasher().hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        """參數過時的雜湊會被更新，需由呼叫端提交"""
+        valid, new_hash = get_hasher().verify(self.password_hash, password)
+        if new_hash:
+            self.password_hash = new_hash
+        return valid
 
     def get_remaining_usage(self):
         # Reset usage count if it's a new month
@@ -48,6 +58,11 @@ class User(UserMixin, db.Model):
         else:
             return max(0, 10 - self.usage_count)  # 10 free uses per month
 
+    def remaining_usage_json(self):
+        """API 回應用：JSON 無法表示無限大，付費用戶以 None 表示不限次數"""
+        remaining = self.get_remaining_usage()
+        return None if remaining == float('inf') else remaining
+
     def increment_usage(self):
         self.usage_count += 1
         db.session.commit()
@@ -59,9 +74,9 @@ class User(UserMixin, db.Model):
             'name': self.name,
             'profile_picture': self.profile_picture,
             'is_premium': self.is_premium,
-            'remaining_usage': self.get_remaining_usage(),
+            'remaining_usage': self.remaining_usage_json(),
             'is_google_user': self.is_google_user,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'created_at': self.created_at
         }
 
 class Resident(db.Model):
@@ -79,13 +94,32 @@ class Resident(db.Model):
     current_care_plan = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # 軟刪除時間；已刪除的住民不出現在任何查詢中，子資料由背景工作分批清除（見 purge.py）
+    deleted_at = db.Column(db.DateTime, nullable=True, index=True)
     
     # Foreign key
-    owner_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    owner_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
     
-    # Relationships
-    care_plan_history = db.relationship('CarePlanHistory', backref='resident', lazy=True, cascade='all, delete-orphan')
-    care_tasks = db.relationship('CareTask', backref='resident', lazy=True, cascade='all, delete-orphan')
+    # Relationships（子資料由資料庫 ON DELETE CASCADE 刪除，不逐筆載入）
+    care_plan_history = db.relationship('CarePlanHistory', backref='resident', lazy=True, cascade='all, delete-orphan',
+                                        passive_deletes=True)
+    care_tasks = db.relationship('CareTask', backref='resident', lazy=True, cascade='all, delete-orphan',
+                                 passive_deletes=True)
+    daily_logs = db.relationship('DailyLog', backref='resident', lazy=True, cascade='all, delete-orphan',
+                                 passive_deletes=True)
+    daily_log_analyses = db.relationship('DailyLogAnalysis', backref='resident', lazy=True,
+                                         cascade='all, delete-orphan', passive_deletes=True)
+    care_plan_archive = db.relationship('CarePlanArchive', backref='resident', lazy=True,
+                                        cascade='all, delete-orphan', passive_deletes=True)
+
+    # 增量同步依 (updated_at, id) 分頁
+    __table_args__ = (
+        db.Index('ix_resident_owner_updated', 'owner_id', 'updated_at', 'id'),
+    )
+
+    def soft_delete(self):
+        """標記為已刪除，隨目前的交易提交"""
+        self.deleted_at = datetime.utcnow()
 
     def to_dict(self, include_tasks=False, include_history=False):
         result = {
@@ -94,15 +128,15 @@ class Resident(db.Model):
             'age': self.age,
             'gender': self.gender,
             'room_number': self.room_number,
-            'admission_date': self.admission_date.isoformat() if self.admission_date else None,
+            'admission_date': self.admission_date,
             'emergency_contact_name': self.emergency_contact_name,
             'emergency_contact_phone': self.emergency_contact_phone,
             'medical_conditions': self.medical_conditions,
             'medications': self.medications,
             'care_notes': self.care_notes,
             'current_care_plan': self.current_care_plan,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
             'owner_id': self.owner_id
         }
         
@@ -110,7 +144,9 @@ class Resident(db.Model):
             result['care_tasks'] = [task.to_dict() for task in self.care_tasks]
         
         if include_history:
-            result['care_plan_history'] = [history.to_dict() for history in self.care_plan_history]
+            # 已封存的版本只列出摘要，內容需以 /care-plan-history/<id> 取得
+            result['care_plan_history'] = [history.to_dict() for history in self.care_plan_history] + \
+                [archived.to_dict() for archived in self.care_plan_archive]
         
         return result
 
@@ -123,7 +159,12 @@ class CarePlanHistory(db.Model):
     version = db.Column(db.Integer, default=1)
     
     # Foreign key
-    resident_id = db.Column(db.Integer, db.ForeignKey('resident.id'), nullable=False)
+    resident_id = db.Column(db.Integer, db.ForeignKey('resident.id', ondelete='CASCADE'), nullable=False)
+
+    # 照護計畫歷史只新增不修改，增量同步依 (created_at, id) 分頁
+    __table_args__ = (
+        db.Index('ix_care_plan_history_created', 'created_at', 'id'),
+    )
 
     def to_dict(self):
         return {
@@ -131,7 +172,7 @@ class CarePlanHistory(db.Model):
             'title': self.title,
             'content': self.content,
             'ai_suggestions': self.ai_suggestions,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'created_at': self.created_at,
             'version': self.version,
             'resident_id': self.resident_id
         }
@@ -150,7 +191,13 @@ class CareTask(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Foreign key
-    resident_id = db.Column(db.Integer, db.ForeignKey('resident.id'), nullable=False)
+    resident_id = db.Column(db.Integer, db.ForeignKey('resident.id', ondelete='CASCADE'), nullable=False)
+
+    # 逾期任務統計只掃描未完成的任務
+    __table_args__ = (
+        db.Index('ix_care_task_resident_status_due', 'resident_id', 'status', 'due_date'),
+        db.Index('ix_care_task_updated', 'updated_at', 'id'),
+    )
 
     def to_dict(self):
         return {
@@ -159,12 +206,12 @@ class CareTask(db.Model):
             'description': self.description,
             'priority': self.priority,
             'status': self.status,
-            'due_date': self.due_date.isoformat() if self.due_date else None,
-            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'due_date': self.due_date,
+            'completed_at': self.completed_at,
             'assigned_to': self.assigned_to,
             'notes': self.notes,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
             'resident_id': self.resident_id
         }
 
@@ -180,10 +227,11 @@ class ShareableLink(db.Model):
     access_count = db.Column(db.Integer, default=0)
     
     # Foreign key
-    created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
     
-    # Many-to-many relationship with residents
-    residents = db.relationship('Resident', secondary=shareable_residents, backref='shared_links')
+    # Many-to-many relationship with residents（關聯列由資料庫 ON DELETE CASCADE 刪除）
+    residents = db.relationship('Resident', secondary=shareable_residents, passive_deletes=True,
+                                backref=db.backref('shared_links', passive_deletes=True))
 
     def __init__(self, **kwargs):
         super(ShareableLink, self).__init__(**kwargs)
@@ -191,10 +239,14 @@ class ShareableLink(db.Model):
             self.share_token = secrets.token_urlsafe(32)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = get_hasher().hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        """參數過時的雜湊會被更新，需由呼叫端提交"""
+        valid, new_hash = get_hasher().verify(self.password_hash, password)
+        if new_hash:
+            self.password_hash = new_hash
+        return valid
 
     def is_expired(self):
         if self.expires_date:
@@ -211,8 +263,8 @@ class ShareableLink(db.Model):
             'share_token': self.share_token,
             'title': self.title,
             'description': self.description,
-            'created_date': self.created_date.isoformat() if self.created_date else None,
-            'expires_date': self.expires_date.isoformat() if self.expires_date else None,
+            'created_date': self.created_date,
+            'expires_date': self.expires_date,
             'is_active': self.is_active,
             'is_expired': self.is_expired(),
             'access_count': self.access_count,
@@ -222,4 +274,165 @@ class ShareableLink(db.Model):
         if include_residents:
             result['residents'] = [resident.to_dict() for resident in self.residents]
         
-        return result 
\ No newline at end of file
+        return result 
+
+class RenderedMarkdown(db.Model):
+    """Markdown 渲染結果快取，以內容雜湊為鍵，重啟後仍可沿用"""
+    content_hash = db.Column(db.String(64), primary_key=True)
+    html = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class RequestProfile(db.Model):
+    """慢請求剖析結果與 N+1 查詢偵測紀錄"""
+    id = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    method = db.Column(db.String(10), nullable=False)
+    path = db.Column(db.String(500), nullable=False)
+    endpoint = db.Column(db.String(120), nullable=True)
+    status_code = db.Column(db.Integer, nullable=True)
+    duration_ms = db.Column(db.Float, nullable=False)
+    query_count = db.Column(db.Integer, default=0)
+    repeated_queries = db.Column(db.Text, nullable=True)  # JSON: [{"statement": ..., "count": ...}]
+    profile = db.Column(db.Text, nullable=True)
+
+    def to_dict(self, include_profile=False):
+        result = {
+            'id': self.id,
+            'created_at': self.created_at,
+            'method': self.method,
+            'path': self.path,
+            'endpoint': self.endpoint,
+            'status_code': self.status_code,
+            'duration_ms': self.duration_ms,
+            'query_count': self.query_count,
+            'repeated_queries': json.loads(self.repeated_queries) if self.repeated_queries else []
+        }
+
+        if include_profile:
+            result['profile'] = self.profile
+
+        return result
+
+class ChangeEvent(db.Model):
+    """住民、照護任務與照護計畫的變更紀錄，供 SSE 變更推送與 Last-Event-ID 續傳"""
+    id = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    entity = db.Column(db.String(30), nullable=False)  # resident, care_task, care_plan_history
+    entity_id = db.Column(db.Integer, nullable=False)
+    action = db.Column(db.String(10), nullable=False)  # created, updated, deleted
+    resident_id = db.Column(db.Integer, nullable=True, index=True)
+    owner_id = db.Column(db.Integer, nullable=True, index=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'created_at': self.created_at,
+            'entity': self.entity,
+            'entity_id': self.entity_id,
+            'action': self.action,
+            'resident_id': self.resident_id
+        }
+
+class AnalyticsCounter(db.Model):
+    """增量維護的統計計數
+
+    scope 為 facility（scope_id = 使用者 id）或 resident（scope_id = 住民 id）；
+    period 為 all（目前狀態）或 YYYY-MM（當月發生的事件數）。
+    """
+    scope = db.Column(db.String(10), primary_key=True)
+    scope_id = db.Column(db.Integer, primary_key=True)
+    period = db.Column(db.String(7), primary_key=True)
+    metric = db.Column(db.String(40), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+class SyncTombstone(db.Model):
+    """已刪除資料的紀錄，讓離線客戶端在增量同步時得知刪除"""
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(30), nullable=False)  # resident
+    entity_id = db.Column(db.Integer, nullable=False)
+    resident_id = db.Column(db.Integer, nullable=True)
+    owner_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_sync_tombstone_owner_deleted', 'owner_id', 'deleted_at', 'id'),
+    )
+
+    def to_dict(self):
+        return {
+            'entity': self.entity,
+            'id': self.entity_id,
+            'resident_id': self.resident_id,
+            'deleted_at': self.deleted_at
+        }
+
+class DailyLog(db.Model):
+    """住民的日常記錄，只新增不修改"""
+    id = db.Column(db.Integer, primary_key=True)
+    resident_id = db.Column(db.Integer, db.ForeignKey('resident.id', ondelete='CASCADE'), nullable=False)
+    author_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='SET NULL'), nullable=True)
+    content = db.Column(db.Text, nullable=False)
+    logged_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)  # 記錄所描述的時間，可補登
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # 依時間範圍查詢單一住民的記錄
+    __table_args__ = (
+        db.Index('ix_daily_log_resident_logged', 'resident_id', 'logged_at', 'id'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'resident_id': self.resident_id,
+            'author_id': self.author_id,
+            'content': self.content,
+            'logged_at': self.logged_at,
+            'created_at': self.created_at
+        }
+
+class DailyLogAnalysis(db.Model):
+    """日常記錄的增量 AI 分析；最新一筆的 summary 即為下次分析使用的累積摘要"""
+    id = db.Column(db.Integer, primary_key=True)
+    resident_id = db.Column(db.Integer, db.ForeignKey('resident.id', ondelete='CASCADE'), nullable=False, index=True)
+    through_log_id = db.Column(db.Integer, nullable=False)  # 已納入分析的最大 DailyLog id
+    log_count = db.Column(db.Integer, nullable=False, default=0)
+    analysis = db.Column(db.Text, nullable=False)
+    summary = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'resident_id': self.resident_id,
+            'through_log_id': self.through_log_id,
+            'log_count': self.log_count,
+            'analysis': self.analysis,
+            'summary': self.summary,
+            'created_at': self.created_at
+        }
+
+class CarePlanArchive(db.Model):
+    """封存的照護計畫歷史版本；id 沿用原 CarePlanHistory id，內容壓縮後存於 payload"""
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    resident_id = db.Column(db.Integer, db.ForeignKey('resident.id', ondelete='CASCADE'), nullable=False, index=True)
+    title = db.Column(db.String(200), nullable=False)
+    version = db.Column(db.Integer, default=1)
+    created_at = db.Column(db.DateTime)
+    has_ai_suggestions = db.Column(db.Boolean, default=False)
+    # 列表只需要摘要欄位，壓縮內容延遲到取用時才載入
+    payload = db.deferred(db.Column(db.LargeBinary, nullable=False))
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self, content=None):
+        result = {
+            'id': self.id,
+            'title': self.title,
+            'created_at': self.created_at,
+            'version': self.version,
+            'resident_id': self.resident_id,
+            'archived': True,
+            'archived_at': self.archived_at
+        }
+        if content is not None:
+            result.update(content)
+        return result
@@ -0,0 +1,179 @@
+"""慢請求剖析與 N+1 查詢偵測（選用）
+
+開啟後：
+- 依取樣比例以 cProfile（或安裝時的 pyinstrument）剖析請求，
+  超過延遲門檻者保存剖析結果到 request_profile 表
+- 記錄每個請求執行的 SQL 語句，同一語句重複達門檻次數時視為 N+1 查詢，
+  寫入日誌並保存紀錄（例如逐一延遲載入 care_tasks / care_plan_history）
+
+保存的紀錄可由管理員透過 /api/v1/admin/profiles 查詢。
+
+設定：
+- PROFILER_ENABLED：預設關閉
+- PROFILER_BACKEND：cprofile / pyinstrument，預設 cprofile
+- PROFILER_SAMPLE_RATE：剖析取樣比例，預設 0.1
+- PROFILER_THRESHOLD_MS：保存剖析結果的延遲門檻，預設 500
+- PROFILER_REPEATED_QUERY_THRESHOLD：同一語句在單一請求中重複多少次視為 N+1，預設 5
+- PROFILER_MAX_STORED：最多保留的紀錄數，預設 200
+"""
+import io
+import json
+import os
+import random
+import time
+from collections import Counter
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import RequestProfile
+
+PROFILE_STATS_LIMIT = 40
+
+
+class _CProfileSession:
+    def __init__(self):
+        import cProfile
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+
+    def render(self):
+        import pstats
+        output = io.StringIO()
+        stats = pstats.Stats(self.profiler, stream=output)
+        stats.sort_stats('cumulative').print_stats(PROFILE_STATS_LIMIT)
+        return output.getvalue()
+
+
+class _PyinstrumentSession:
+    def __init__(self):
+        import pyinstrument
+        self.profiler = pyinstrument.Profiler(async_mode='disabled')
+        self.profiler.start()
+
+    def stop(self):
+        self.profiler.stop()
+
+    def render(self):
+        return self.profiler.output_text(unicode=True)
+
+
+def _start_session(backend):
+    try:
+        if backend == 'pyinstrument':
+            try:
+                return _PyinstrumentSession()
+            except ImportError:  # pyinstrument 為選用依賴，未安裝時改用 cProfile
+                pass
+        return _CProfileSession()
+    except (ValueError, RuntimeError) as e:
+        # 同一時間只能有一個剖析器啟用（其他執行緒或除錯工具），略過這次取樣
+        current_app.logger.debug(f"Profiler unavailable: {str(e)}")
+        return None
+
+
+def find_repeated_queries(statements, threshold):
+    """返回重複次數達門檻的語句，依次數由多到少排序"""
+    return [
+        {"statement": statement, "count": count}
+        for statement, count in statements.most_common()
+        if count >= threshold
+    ]
+
+
+def instrument_engine(engine):
+    @event.listens_for(engine, 'after_cursor_execute')
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        if not has_request_context():
+            return
+        statements = g.get('profiler_statements')
+        if statements is not None:
+            statements[statement] += 1
+
+
+def _store(engine, record, max_stored):
+    table = RequestProfile.__table__
+    try:
+        with engine.begin() as conn:
+            conn.execute(table.insert(), record)
+            # 只保留最新的 max_stored 筆
+            cutoff = conn.execute(
+                select(table.c.id).order_by(table.c.id.desc()).offset(max_stored).limit(1)
+            ).scalar()
+            if cutoff is not None:
+                conn.execute(table.delete().where(table.c.id <= cutoff))
+    except SQLAlchemyError as e:
+        current_app.logger.warning(f"Request profile store error: {str(e)}")
+
+
+def init_profiling(app, db):
+    app.config.setdefault('PROFILER_ENABLED', os.environ.get('PROFILER_ENABLED', '0') == '1')
+    app.config.setdefault('PROFILER_BACKEND', os.environ.get('PROFILER_BACKEND', 'cprofile'))
+    app.config.setdefault('PROFILER_SAMPLE_RATE', float(os.environ.get('PROFILER_SAMPLE_RATE', 0.1)))
+    app.config.setdefault('PROFILER_THRESHOLD_MS', float(os.environ.get('PROFILER_THRESHOLD_MS', 500)))
+    app.config.setdefault('PROFILER_REPEATED_QUERY_THRESHOLD',
+                          int(os.environ.get('PROFILER_REPEATED_QUERY_THRESHOLD', 5)))
+    app.config.setdefault('PROFILER_MAX_STORED', int(os.environ.get('PROFILER_MAX_STORED', 200)))
+    if not app.config['PROFILER_ENABLED']:
+        return
+
+    with app.app_context():
+        for engine in db.engines.values():
+            instrument_engine(engine)
+
+    @app.before_request
+    def start_profiling():
+        g.profiler_started = time.perf_counter()
+        g.profiler_statements = Counter()
+        g.profiler_session = None
+        if random.random() < app.config['PROFILER_SAMPLE_RATE']:
+            g.profiler_session = _start_session(app.config['PROFILER_BACKEND'])
+
+    @app.after_request
+    def finish_profiling(response):
+        started = g.get('profiler_started')
+        if started is None:
+            return response
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        session = g.pop('profiler_session', None)
+        if session is not None:
+            session.stop()
+
+        statements = g.profiler_statements
+        repeated = find_repeated_queries(statements, app.config['PROFILER_REPEATED_QUERY_THRESHOLD'])
+        if repeated:
+            current_app.logger.warning(
+                f"Repeated SQL in {request.method} {request.path}: "
+                f"{repeated[0]['count']}x {repeated[0]['statement'][:200]}"
+            )
+
+        slow = session is not None and duration_ms >= app.config['PROFILER_THRESHOLD_MS']
+        if slow or repeated:
+            _store(db.engine, {
+                'method': request.method,
+                'path': request.full_path.rstrip('?')[:500],
+                'endpoint': request.endpoint,
+                'status_code': response.status_code,
+                'duration_ms': round(duration_ms, 2),
+                'query_count': sum(statements.values()),
+                'repeated_queries': json.dumps(repeated, ensure_ascii=False) if repeated else None,
+                'profile': session.render() if slow else None,
+            }, app.config['PROFILER_MAX_STORED'])
+        return response
+
+    @app.teardown_request
+    def stop_profiling(exc):
+        # 未經 after_request 的請求（未處理例外）也要停止剖析器
+        session = g.pop('profiler_session', None)
+        if session is not None:
+            session.stop()
+
+
+def list_profiles(limit=50):
+    """最新的剖析紀錄，由新到舊"""
+    return RequestProfile.query.order_by(RequestProfile.id.desc()).limit(limit).all()
@@ -0,0 +1,197 @@
+"""DeepSeek 提示組裝
+
+住民的醫療狀況、用藥、照護計畫等欄位長度不受限制，直接嵌入提示會讓請求變慢，甚至超過上下文長度。
+這裡以本地估算的 token 數為每個區段設定預算，超出時依策略截斷或摘要：
+
+- head：保留開頭
+- tail：保留結尾（最新的記錄通常在後）
+- middle：保留開頭與結尾
+- outline：Markdown 只保留標題與各段第一行，仍超出時再保留開頭
+
+住民資訊區塊依 (住民 id, updated_at) 快取，住民資料變更後才重新產生。
+"""
+import math
+import os
+import re
+import threading
+from collections import OrderedDict
+
+# 提高版本會讓所有快取的住民資訊區塊失效
+CONTEXT_VERSION = 1
+CONTEXT_CACHE_SIZE = 1024
+
+# 整個 user 訊息的 token 上限
+DEFAULT_PROMPT_BUDGET = int(os.environ.get('PROMPT_TOKEN_BUDGET', 6000))
+
+SECTION_BUDGETS = {
+    'medical_conditions': 250,
+    'medications': 200,
+    'care_notes': 150,
+    'daily_log': 1500,
+    'current_plan': 1200,
+    'analysis_result': 1500,
+    'additional_notes': 400,
+    'daily_logs': 3000,
+    'daily_log_entry': 500,
+    'summary': 1200,
+}
+
+# DeepSeek 官方估算：中文字約 0.6 token、英數字元約 0.3 token
+CJK_TOKENS_PER_CHAR = 0.6
+OTHER_TOKENS_PER_CHAR = 0.3
+
+CJK_RE = re.compile(r'[\u3000-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]')
+HEADING_RE = re.compile(r'^\s{0,3}#{1,6}\s')
+
+TRUNCATED = '…（已截斷）'
+OMITTED = '（前略）…'
+
+
+def estimate_tokens(text):
+    if not text:
+        return 0
+    cjk = len(CJK_RE.findall(text))
+    return math.ceil(cjk * CJK_TOKENS_PER_CHAR + (len(text) - cjk) * OTHER_TOKENS_PER_CHAR)
+
+
+def _longest_fit(render, length, budget):
+    """二分搜尋 render(n) 不超過預算的最大 n"""
+    low, high = 0, length
+    while low < high:
+        mid = (low + high + 1) // 2
+        if estimate_tokens(render(mid)) <= budget:
+            low = mid
+        else:
+            high = mid - 1
+    return render(low)
+
+
+def _head(text, budget):
+    return _longest_fit(lambda n: text[:n].rstrip() + TRUNCATED, len(text), budget)
+
+
+def _tail(text, budget):
+    return _longest_fit(lambda n: OMITTED + text[len(text) - n:].lstrip(), len(text), budget)
+
+
+def _middle(text, budget):
+    def render(n):
+        head = n * 2 // 3
+        return text[:head].rstrip() + '\n…（中略）…\n' + text[len(text) - (n - head):].lstrip()
+    return _longest_fit(render, len(text), budget)
+
+
+def _outline(text, budget):
+    lines = text.splitlines()
+    if not any(HEADING_RE.match(line) for line in lines):
+        return _head(text, budget)
+    kept, take_next = [], False
+    for line in lines:
+        if HEADING_RE.match(line):
+            kept.append(line)
+            take_next = True
+        elif take_next and line.strip():
+            kept.append(line)
+            take_next = False
+    outline = '\n'.join(kept) + '\n（各段僅列首行）'
+    return outline if estimate_tokens(outline) <= budget else _head(outline, budget)
+
+
+POLICIES = {'head': _head, 'tail': _tail, 'middle': _middle, 'outline': _outline}
+
+
+def as_text(value):
+    """客戶端傳入的值可能是數字或清單，與 f-string 相同地以 str() 轉換；None 為空字串"""
+    return '' if value is None else (value if isinstance(value, str) else str(value)).strip()
+
+
+def fit(text, budget, policy='head'):
+    """將文字縮減到 token 預算內"""
+    text = as_text(text)
+    if estimate_tokens(text) <= budget:
+        return text
+    return POLICIES[policy](text, budget)
+
+
+class PromptBuilder:
+    """依序組裝固定文字與有預算的區段；總長超出時按比例壓縮各區段"""
+
+    def __init__(self, budget=None):
+        self.budget = budget or DEFAULT_PROMPT_BUDGET
+        self._parts = []
+
+    def text(self, text):
+        self._parts.append((None, text, None, None))
+        return self
+
+    def section(self, title, text, budget=None, policy='head', empty='無'):
+        """budget 為 None 時不截斷（例如已在快取中控制長度的住民資訊）"""
+        text = as_text(text)
+        self._parts.append((title, text or empty, budget, policy))
+        return self
+
+    def _render(self, scale):
+        rendered = []
+        for title, text, budget, policy in self._parts:
+            if budget is not None:
+                text = fit(text, max(int(budget * scale), 1), policy)
+            rendered.append(f"{title}：\n{text}" if title else text)
+        return '\n\n'.join(part.strip('\n') for part in rendered)
+
+    def build(self):
+        prompt = self._render(1.0)
+        total = estimate_tokens(prompt)
+        if total <= self.budget:
+            return prompt
+        fixed = sum(estimate_tokens(text) for _, text, budget, _ in self._parts if budget is None)
+        flexible = sum(budget for _, _, budget, _ in self._parts if budget is not None)
+        if not flexible:
+            return prompt
+        scale = min(max(self.budget - fixed, 0) / flexible, 1.0)
+        prompt = self._render(scale)
+        # 標題與分隔符號未計入區段預算，必要時再逐步壓縮
+        while estimate_tokens(prompt) > self.budget and scale > 0.05:
+            scale *= 0.9
+            prompt = self._render(scale)
+        return prompt
+
+
+# --- Resident context ---
+
+_context_cache = OrderedDict()
+_context_lock = threading.Lock()
+
+
+def format_resident_context(info):
+    """住民資訊區塊；info 可為 dict 或具有相同屬性的物件"""
+    get = info.get if isinstance(info, dict) else lambda key, default=None: getattr(info, key, default)
+    basics = [f"姓名：{get('name') or '未提供'}", f"年齡：{get('age') or '未提供'}"]
+    if get('gender'):
+        basics.append(f"性別：{get('gender')}")
+    if get('room_number'):
+        basics.append(f"房間號碼：{get('room_number')}")
+    lines = basics + [
+        f"醫療狀況：{fit(get('medical_conditions'), SECTION_BUDGETS['medical_conditions'], 'middle') or '未提供'}",
+        f"當前用藥：{fit(get('medications'), SECTION_BUDGETS['medications'], 'head') or '未提供'}",
+    ]
+    if get('care_notes'):
+        lines.append(f"照護備註：{fit(get('care_notes'), SECTION_BUDGETS['care_notes'], 'tail')}")
+    return '\n'.join(lines)
+
+
+def resident_context(resident):
+    """依住民 updated_at 快取的住民資訊區塊，住民資料變更後才重新產生"""
+    version = (resident.updated_at, CONTEXT_VERSION)
+    with _context_lock:
+        cached = _context_cache.get(resident.id)
+        if cached is not None and cached[0] == version:
+            _context_cache.move_to_end(resident.id)
+            return cached[1]
+
+    context = format_resident_context(resident)
+    with _context_lock:
+        _context_cache[resident.id] = (version, context)
+        _context_cache.move_to_end(resident.id)
+        while len(_context_cache) > CONTEXT_CACHE_SIZE:
+            _context_cache.popitem(last=False)
+    return context
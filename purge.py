@@ -0,0 +1,132 @@
+"""住民刪除與背景清除
+
+刪除住民時只標記 deleted_at（Resident.soft_delete），請求立即返回；所有 ORM 查詢（包含
+join 與關聯載入）都會自動排除已刪除的住民，其照護任務、計畫歷史等子資料也隨之無法取得。
+變更推送、統計與同步刪除紀錄在標記時就已處理。
+
+背景工作每 RESIDENT_PURGE_INTERVAL_SECONDS 秒（0 表示停用）分批刪除已刪除住民的子資料，
+每批最多 RESIDENT_PURGE_BATCH 筆、各自一個交易，不長時間持有鎖；子資料清空後才刪除住民本身。
+清除以 Core 陳述式進行，不經過 ORM 事件。也可手動執行 `flask --app app purge-deleted-residents`。
+
+變更事件（change_event）一併刪除，只保留住民本身的刪除事件，讓以 Last-Event-ID 續傳的客戶端
+仍會收到，之後依 EVENTS_RETENTION_HOURS 清除。同步刪除紀錄（sync_tombstone）是離線客戶端得知
+刪除的唯一來源，保留到 SYNC_TOMBSTONE_RETENTION_DAYS 後由同一個背景工作清除；兩者都只含 id。
+
+外鍵皆設為 ON DELETE CASCADE，ORM 關聯設 passive_deletes：直接刪除住民或使用者時由資料庫
+刪除子資料，不再逐筆載入。
+"""
+import os
+
+import click
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, with_loader_criteria
+
+from jobs import PeriodicJob, register_job
+from models import (db, shareable_residents, Resident, CareTask, CarePlanHistory, CarePlanArchive,
+                    DailyLog, DailyLogAnalysis, ChangeEvent)
+from sync import prune_tombstones
+
+# 依序清除的子資料表；沒有 id 欄位的關聯表一次刪除（每個分享連結一列）
+CHILD_TABLES = (
+    CareTask.__table__,
+    CarePlanHistory.__table__,
+    CarePlanArchive.__table__,
+    DailyLogAnalysis.__table__,
+    DailyLog.__table__,
+    ChangeEvent.__table__,
+    shareable_residents,
+)
+
+
+def _child_rows(table, resident_id):
+    condition = table.c.resident_id == resident_id
+    if table is ChangeEvent.__table__:
+        condition &= ~((table.c.entity == 'resident') & (table.c.action == 'deleted'))
+    return condition
+
+
+def hide_deleted_residents(execute_state):
+    """do_orm_execute：為每個 ORM 查詢加上 Resident.deleted_at IS NULL
+
+    已載入物件的欄位重新整理（例如提交後過期）不加條件，否則刪除後無法再讀取其欄位；
+    關聯載入則沿用原查詢的條件。
+    """
+    if (
+        execute_state.is_select
+        and not execute_state.is_column_load
+        and not execute_state.is_relationship_load
+        and not execute_state.execution_options.get('include_deleted', False)
+    ):
+        execute_state.statement = execute_state.statement.options(
+            with_loader_criteria(Resident, Resident.deleted_at.is_(None), include_aliases=True)
+        )
+
+
+def _next_deleted(conn):
+    resident = Resident.__table__
+    return conn.execute(
+        select(resident.c.id).where(resident.c.deleted_at.is_not(None))
+        .order_by(resident.c.deleted_at, resident.c.id).limit(1)
+    ).scalar()
+
+
+def purge_batch(batch_size):
+    """清除一批已刪除住民的資料，返回刪除筆數（0 表示沒有待清除的住民）；每批各自一個交易"""
+    with db.engine.begin() as conn:
+        resident_id = _next_deleted(conn)
+        if resident_id is None:
+            return 0
+        for table in CHILD_TABLES:
+            if 'id' in table.c:
+                ids = conn.execute(
+                    select(table.c.id).where(_child_rows(table, resident_id)).limit(batch_size)
+                ).scalars().all()
+                deleted = conn.execute(table.delete().where(table.c.id.in_(ids))).rowcount if ids else 0
+            else:
+                deleted = conn.execute(table.delete().where(table.c.resident_id == resident_id)).rowcount
+            if deleted:
+                return deleted
+        # 子資料已清空
+        resident = Resident.__table__
+        return conn.execute(resident.delete().where(resident.c.id == resident_id)).rowcount
+
+
+def purge_deleted_residents(batch_size=1000, max_batches=None):
+    """返回刪除的總筆數（包含住民本身）"""
+    total = batches = 0
+    while max_batches is None or batches < max_batches:
+        deleted = purge_batch(batch_size)
+        if not deleted:
+            break
+        total += deleted
+        batches += 1
+    return total
+
+
+def init_purge(app):
+    app.config.setdefault('RESIDENT_PURGE_BATCH', int(os.environ.get('RESIDENT_PURGE_BATCH', 1000)))
+    app.config.setdefault('RESIDENT_PURGE_MAX_BATCHES', int(os.environ.get('RESIDENT_PURGE_MAX_BATCHES', 100)))
+    app.config.setdefault('RESIDENT_PURGE_INTERVAL_SECONDS',
+                          float(os.environ.get('RESIDENT_PURGE_INTERVAL_SECONDS', 60)))
+
+    if not event.contains(Session, 'do_orm_execute', hide_deleted_residents):
+        event.listen(Session, 'do_orm_execute', hide_deleted_residents)
+
+    def run(app):
+        # 每次執行有上限，剩下的留待下次，避免單次執行佔用連線過久
+        purged = purge_deleted_residents(app.config['RESIDENT_PURGE_BATCH'], app.config['RESIDENT_PURGE_MAX_BATCHES'])
+        if purged:
+            app.logger.info(f"Purged {purged} row(s) of deleted residents")
+        pruned = prune_tombstones(app.config['SYNC_TOMBSTONE_RETENTION_DAYS'])
+        if pruned:
+            app.logger.info(f"Pruned {pruned} sync tombstone(s)")
+        return purged + pruned
+
+    job = PeriodicJob('resident-purge', run, app.config['RESIDENT_PURGE_INTERVAL_SECONDS'])
+    register_job(app, job)
+
+    @app.cli.command('purge-deleted-residents')
+    def purge_deleted_residents_command():
+        """清除已刪除住民的所有資料"""
+        purged = purge_deleted_residents(app.config['RESIDENT_PURGE_BATCH'])
+        click.echo(f"Purged {purged} row(s) of deleted residents")
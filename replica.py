@@ -0,0 +1,153 @@
+"""唯讀副本路由
+
+設定 DATABASE_REPLICA_URL 後，副本以 `replica` bind 加入，api_v1 的 GET 請求改由副本讀取：
+
+- flush、INSERT/UPDATE/DELETE 一律送到主資料庫；同一個 session 寫入後，之後的讀取也改回主資料庫
+- 同一個客戶端寫入後的 REPLICA_STICKY_SECONDS 秒內，其 GET 請求仍讀主資料庫（read-your-writes）
+- 每 REPLICA_LAG_CHECK_INTERVAL 秒檢查一次副本延遲，超過 REPLICA_MAX_LAG_SECONDS 或無法連線時
+  全部改回主資料庫
+- 需要最新資料的端點以 @use_primary 標記
+
+本地測試可將 DATABASE_REPLICA_URL 指向另一個 SQLite 檔案，並以
+`flask --app app sync-replica` 將主資料庫複製過去。
+"""
+import os
+import threading
+import time
+
+import click
+import sqlalchemy as sa
+from flask import current_app, request, session as http_session
+from flask_sqlalchemy.session import Session as BaseSession
+
+REPLICA_BIND = 'replica'
+
+# 寫入後在 cookie session 中記錄的時間點，之前的 GET 請求讀主資料庫
+PRIMARY_UNTIL_KEY = '_primary_until'
+
+
+class RoutingSession(BaseSession):
+    """session.info['use_replica'] 為 True 時，將未寫入過的讀取送往副本"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            if self._flushing or getattr(clause, 'is_dml', False):
+                self.info['wrote'] = True
+            elif self.info.get('use_replica') and not self.info.get('wrote') and not _has_bind_key(mapper):
+                engine = self._db.engines.get(REPLICA_BIND)
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _has_bind_key(mapper):
+    # 指定了其他 bind 的模型不經副本
+    if mapper is None:
+        return False
+    return sa.inspect(mapper).local_table.metadata.info.get('bind_key') is not None
+
+
+def use_primary(f):
+    """標記端點一律讀主資料庫"""
+    f._use_primary = True
+    return f
+
+
+class LagMonitor:
+    """快取副本延遲檢查結果，避免每個請求都查詢"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked_at = 0
+        self.lag = None
+
+    def healthy(self, engine, max_lag, interval):
+        if time.monotonic() - self._checked_at >= interval and self._lock.acquire(blocking=False):
+            try:
+                self.lag = measure_lag(engine)
+            except Exception as e:
+                current_app.logger.error(f"Replica lag check error: {str(e)}")
+                self.lag = None
+            finally:
+                self._checked_at = time.monotonic()
+                self._lock.release()
+        return self.lag is not None and self.lag <= max_lag
+
+
+def measure_lag(engine):
+    """副本落後主資料庫的秒數；無法得知時（如 SQLite）視為 0"""
+    with engine.connect() as conn:
+        if engine.dialect.name != 'postgresql':
+            conn.exec_driver_sql('SELECT 1')
+            return 0.0
+        lag = conn.exec_driver_sql(
+            'SELECT CASE WHEN pg_is_in_recovery() '
+            'THEN EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) ELSE 0 END'
+        ).scalar()
+        return float(lag or 0)
+
+
+def configure_app(app, replica_url, engine_options=None):
+    """在 db.init_app() 之前呼叫，將副本加入 SQLALCHEMY_BINDS"""
+    app.config.setdefault('REPLICA_MAX_LAG_SECONDS', float(os.environ.get('REPLICA_MAX_LAG_SECONDS', 10)))
+    app.config.setdefault('REPLICA_STICKY_SECONDS', float(os.environ.get('REPLICA_STICKY_SECONDS', 5)))
+    app.config.setdefault('REPLICA_LAG_CHECK_INTERVAL', float(os.environ.get('REPLICA_LAG_CHECK_INTERVAL', 5)))
+    if not replica_url:
+        return
+    if replica_url.startswith('postgres://'):
+        replica_url = replica_url.replace('postgres://', 'postgresql://', 1)
+    app.config.setdefault('SQLALCHEMY_BINDS', {})[REPLICA_BIND] = {'url': replica_url, **(engine_options or {})}
+
+
+def _replica_allowed(app):
+    if request.method != 'GET' or request.blueprint != 'api_v1':
+        return False
+    view = app.view_functions.get(request.endpoint)
+    if view is None or getattr(view, '_use_primary', False):
+        return False
+    if http_session.get(PRIMARY_UNTIL_KEY, 0) > time.time():
+        return False
+    return True
+
+
+def sync_sqlite_replica(primary, replica):
+    """以 SQLite backup API 將主資料庫完整複製到副本（僅供本地測試）"""
+    source = primary.raw_connection()
+    target = replica.raw_connection()
+    try:
+        source.driver_connection.backup(target.driver_connection)
+    finally:
+        target.close()
+        source.close()
+
+
+def init_replica(app, db):
+    with app.app_context():
+        engine = db.engines.get(REPLICA_BIND)
+    app.extensions['replica'] = engine
+    if engine is None:
+        return
+
+    monitor = LagMonitor()
+
+    @app.before_request
+    def route_reads_to_replica():
+        config = app.config
+        if _replica_allowed(app) and monitor.healthy(
+            engine, config['REPLICA_MAX_LAG_SECONDS'], config['REPLICA_LAG_CHECK_INTERVAL']
+        ):
+            db.session.info['use_replica'] = True
+
+    @app.after_request
+    def remember_write(response):
+        if db.session.info.get('wrote'):
+            http_session[PRIMARY_UNTIL_KEY] = time.time() + app.config['REPLICA_STICKY_SECONDS']
+        return response
+
+    @app.cli.command('sync-replica')
+    def sync_replica_command():
+        """將主資料庫複製到副本（僅支援兩者皆為 SQLite）"""
+        if db.engine.dialect.name != 'sqlite' or engine.dialect.name != 'sqlite':
+            raise click.ClickException('sync-replica only supports SQLite databases')
+        sync_sqlite_replica(db.engine, engine)
+        click.echo(f"Copied {db.engine.url.database} to {engine.url.database}")
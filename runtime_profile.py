@@ -0,0 +1,123 @@
+"""執行環境設定檔
+
+依 APP_PROFILE（未設定時沿用 FLASK_ENV）選擇 development 或 production，
+集中設定資料庫連線池與 SQLite PRAGMA，gunicorn.conf.py 也從這裡取得並行數。
+以 gunicorn.conf.py 啟動時 APP_PROFILE 預設為 production；其他方式啟動且未設定 APP_PROFILE 時，
+啟動時會記錄警告，避免正式環境誤用開發設定。
+
+可用環境變數覆寫：
+- DB_POOL_SIZE / DB_MAX_OVERFLOW / DB_POOL_RECYCLE / DB_POOL_TIMEOUT
+- WEB_CONCURRENCY（gunicorn worker 數，預設 CPU 核心數 × 2 + 1）
+- GUNICORN_THREADS（每個 worker 的執行緒數，預設 CPU 核心數 × 2，最多 8）
+"""
+import multiprocessing
+import os
+
+from sqlalchemy import event
+
+PROFILES = {
+    'development': {
+        'pool_pre_ping': False,
+        'pool_recycle': -1,
+        'sqlite_pragmas': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'busy_timeout': 5000,
+            'foreign_keys': 'ON',
+        },
+    },
+    'production': {
+        'pool_pre_ping': True,
+        'pool_recycle': 1800,  # 早於多數代管 PostgreSQL 的閒置斷線時間
+        'pool_timeout': 10,
+        'sqlite_pragmas': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'busy_timeout': 5000,
+            'foreign_keys': 'ON',
+            'mmap_size': 256 * 1024 * 1024,
+            'cache_size': -64000,  # 負值單位為 KiB，約 64MB
+            'temp_store': 'MEMORY',
+        },
+    },
+}
+
+
+MAX_DEFAULT_THREADS = 8
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def get_profile_name():
+    name = os.environ.get('APP_PROFILE') or os.environ.get('FLASK_ENV', 'development')
+    return name if name in PROFILES else 'development'
+
+
+def get_profile(name=None):
+    return PROFILES[name or get_profile_name()]
+
+
+def worker_count():
+    return _env_int('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1)
+
+
+def worker_threads():
+    # 請求多在等待 DeepSeek 與資料庫：每核心 2 條執行緒；連線池大小隨執行緒數增加，因此設上限
+    return _env_int('GUNICORN_THREADS', min(MAX_DEFAULT_THREADS, multiprocessing.cpu_count() * 2))
+
+
+def is_sqlite(database_url):
+    return database_url.startswith('sqlite')
+
+
+def engine_options(database_url, profile=None):
+    """產生 SQLALCHEMY_ENGINE_OPTIONS；SQLite 不使用連線池參數"""
+    profile = profile or get_profile()
+    if is_sqlite(database_url):
+        return {}
+
+    # 每個執行緒最多同時持有一條連線，連線池至少要容納一個 worker 的所有執行緒
+    return {
+        'pool_size': _env_int('DB_POOL_SIZE', max(5, worker_threads())),
+        'max_overflow': _env_int('DB_MAX_OVERFLOW', 10),
+        'pool_recycle': _env_int('DB_POOL_RECYCLE', profile['pool_recycle']),
+        'pool_timeout': _env_int('DB_POOL_TIMEOUT', profile.get('pool_timeout', 30)),
+        'pool_pre_ping': profile['pool_pre_ping'],
+    }
+
+
+def apply_sqlite_pragmas(engine, pragmas):
+    """在每條新的 SQLite 連線上套用 PRAGMA"""
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for key, value in pragmas.items():
+                cursor.execute(f'PRAGMA {key}={value}')
+        finally:
+            cursor.close()
+
+
+def configure_app(app, database_url):
+    """在 db.init_app() 之前呼叫，寫入引擎設定"""
+    app.config['RUNTIME_PROFILE'] = get_profile_name()
+    if os.environ.get('APP_PROFILE') not in PROFILES:
+        app.logger.warning(
+            f"APP_PROFILE is not set to one of {', '.join(PROFILES)}; "
+            f"using the {app.config['RUNTIME_PROFILE']} profile (set APP_PROFILE=production for deployments)"
+        )
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(database_url)
+
+
+def init_engines(app, db):
+    """在 db.init_app() 之後呼叫，為所有資料庫引擎掛上連線事件"""
+    pragmas = get_profile(app.config['RUNTIME_PROFILE'])['sqlite_pragmas']
+    with app.app_context():
+        for engine in db.engines.values():
+            apply_sqlite_pragmas(engine, pragmas)
@@ -0,0 +1,72 @@
+"""API JSON 序列化
+
+以 Flask 的 JSON provider 機制替換預設編碼器：安裝了 orjson 時使用 orjson，
+否則退回內建 json。兩者都直接把 datetime / date 編碼為 ISO 8601 字串，
+模型的 to_dict() 因此可以直接返回日期時間物件。
+
+透過 JSON_SERIALIZER 環境變數（auto / orjson / stdlib）選擇實作。
+"""
+import dataclasses
+import uuid
+from datetime import date, datetime, time
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson 為選用依賴
+    orjson = None
+
+
+def _default(o):
+    if isinstance(o, (datetime, date, time)):
+        return o.isoformat()
+    if isinstance(o, uuid.UUID):
+        return str(o)
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """內建 json 實作；日期時間輸出 ISO 8601，與 orjson 的格式一致"""
+    default = staticmethod(_default)
+    ensure_ascii = False  # 中文內容不轉義，回應體積較小
+    sort_keys = False
+
+
+class OrjsonProvider(StdlibJSONProvider):
+    """orjson 實作，直接產生 bytes，省去字串編碼的往返"""
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            # orjson 不支援 json.dumps 的參數，交給內建實作處理
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            option |= orjson.OPT_INDENT_2
+        return self._app.response_class(
+            orjson.dumps(obj, default=_default, option=option), mimetype=self.mimetype
+        )
+
+
+def json_provider_class(name='auto'):
+    """依名稱選擇 JSON provider；auto 在可用時優先使用 orjson"""
+    if name == 'stdlib':
+        return StdlibJSONProvider
+    if name == 'orjson':
+        if orjson is None:
+            raise RuntimeError("JSON_SERIALIZER=orjson but orjson is not installed")
+        return OrjsonProvider
+    return OrjsonProvider if orjson is not None else StdlibJSONProvider
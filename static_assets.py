@@ -0,0 +1,204 @@
+"""前端靜態檔案服務
+
+首次請求時掃描 build/（或 public/）建立資產清單：路徑、大小、內容雜湊、MIME 類型，
+以及預先壓縮的 .br / .gz 版本。之後只做字典查詢，不再逐次檢查檔案系統。
+掃描延後到首次使用，不拖慢冷啟動；gunicorn 會在主行程預先載入。
+
+- 檔名含雜湊的資產（如 main.23120626.js）回傳 `Cache-Control: immutable`，快取一年
+- 其他檔案（index.html 等）回傳 `no-cache`，由 ETag 重新驗證
+- 存在預壓縮版本時依 Accept-Encoding 直接送出，不在請求中即時壓縮
+
+`flask --app app precompress-assets` 可為現有檔案產生 .br / .gz 版本。
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from datetime import datetime, timezone
+
+import click
+from flask import current_app, request
+from werkzeug.utils import get_content_type
+from werkzeug.wsgi import wrap_file
+
+from compression import COMPRESSIBLE_MIMETYPES, brotli
+
+# CRA 輸出的檔名帶有內容雜湊，例如 main.23120626.js、main.3f2a1b9c.chunk.css
+HASHED_FILENAME_RE = re.compile(r'\.[0-9a-f]{8,}\.')
+
+PRECOMPRESSED_SUFFIXES = {'.br': 'br', '.gz': 'gzip'}
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+INDEX_FILE = 'index.html'
+
+PRECOMPRESS_MIN_SIZE = 1024
+
+
+class StaticAsset:
+    __slots__ = ('path', 'file_path', 'size', 'etag', 'mimetype', 'last_modified', 'immutable', 'variants')
+
+    def __init__(self, path, file_path, size, etag, mimetype, last_modified, immutable):
+        self.path = path
+        self.file_path = file_path
+        self.size = size
+        self.etag = etag
+        self.mimetype = mimetype
+        self.last_modified = last_modified
+        self.immutable = immutable
+        # 編碼 -> (檔案路徑, 大小)
+        self.variants = {}
+
+
+def _file_digest(file_path):
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:20]
+
+
+class AssetManifest:
+    """靜態檔案清單，以相對路徑（URL 路徑）為鍵"""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self._assets = None
+        self._lock = threading.Lock()
+
+    @property
+    def assets(self):
+        if self._assets is None:
+            with self._lock:
+                if self._assets is None:
+                    self.scan()
+        return self._assets
+
+    def scan(self):
+        assets = {}
+        variants = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                file_path = os.path.join(dirpath, filename)
+                path = os.path.relpath(file_path, self.root).replace(os.sep, '/')
+                base, ext = os.path.splitext(path)
+                if ext in PRECOMPRESSED_SUFFIXES:
+                    variants.append((base, PRECOMPRESSED_SUFFIXES[ext], file_path))
+                    continue
+
+                stat = os.stat(file_path)
+                mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+                assets[path] = StaticAsset(
+                    path=path,
+                    file_path=file_path,
+                    size=stat.st_size,
+                    etag=_file_digest(file_path),
+                    mimetype=get_content_type(mimetype, 'utf-8'),
+                    last_modified=datetime.fromtimestamp(int(stat.st_mtime), tz=timezone.utc),
+                    immutable=bool(HASHED_FILENAME_RE.search(filename)),
+                )
+
+        for base, encoding, file_path in variants:
+            asset = assets.get(base)
+            # 壓縮檔比原檔舊代表已過期，忽略以免送出舊內容
+            if asset and os.stat(file_path).st_mtime >= asset.last_modified.timestamp():
+                asset.variants[encoding] = (file_path, os.stat(file_path).st_size)
+
+        self._assets = assets
+        return self
+
+    def get(self, path):
+        return self.assets.get(path)
+
+    @property
+    def index(self):
+        return self.assets.get(INDEX_FILE)
+
+
+def _apply_cache_headers(response, asset, etag):
+    response.set_etag(etag)
+    response.last_modified = asset.last_modified
+    if asset.immutable:
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    if asset.variants:
+        response.vary.add('Accept-Encoding')
+
+
+def send_asset(asset):
+    """依清單送出檔案，必要時選擇預壓縮版本並處理條件請求"""
+    encoding = None
+    file_path, size = asset.file_path, asset.size
+    if asset.variants:
+        encoding = request.accept_encodings.best_match(list(asset.variants))
+        if encoding:
+            file_path, size = asset.variants[encoding]
+    etag = f'{asset.etag}-{encoding}' if encoding else asset.etag
+
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+        _apply_cache_headers(response, asset, etag)
+        return response
+
+    data = wrap_file(request.environ, open(file_path, 'rb'))
+    response = current_app.response_class(data, mimetype=asset.mimetype, direct_passthrough=True)
+    response.content_length = size
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    _apply_cache_headers(response, asset, etag)
+    return response.make_conditional(request.environ, accept_ranges=True, complete_length=size)
+
+
+def precompress(manifest, min_size=PRECOMPRESS_MIN_SIZE):
+    """為可壓縮的檔案產生 .gz（以及安裝 brotli 時的 .br），返回新產生的檔案數"""
+    written = 0
+    for asset in manifest.assets.values():
+        if asset.size < min_size or asset.mimetype.split(';')[0] not in COMPRESSIBLE_MIMETYPES:
+            continue
+        with open(asset.file_path, 'rb') as f:
+            body = f.read()
+
+        targets = {'gzip': (asset.file_path + '.gz', lambda b: gzip.compress(b, compresslevel=9))}
+        if brotli is not None:
+            targets['br'] = (asset.file_path + '.br', lambda b: brotli.compress(b, quality=11))
+
+        for encoding, (target, compressor) in targets.items():
+            if encoding in asset.variants:
+                continue
+            compressed = compressor(body)
+            if len(compressed) >= asset.size:
+                continue
+            with open(target, 'wb') as f:
+                f.write(compressed)
+            written += 1
+    manifest.scan()
+    return written
+
+
+def init_static_assets(app, root):
+    manifest = AssetManifest(root)
+    app.extensions['static_assets'] = manifest
+
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve(path):
+        asset = manifest.get(path) if path else None
+        if asset is None:
+            # 前端路由（React Router）一律回傳 index.html
+            asset = manifest.index
+        if asset is None:
+            return {"success": False, "error": {"message": "Not found"}}, 404
+        return send_asset(asset)
+
+    @app.cli.command('precompress-assets')
+    def precompress_assets_command():
+        """為前端靜態檔案產生 .br / .gz 預壓縮版本"""
+        written = precompress(manifest)
+        click.echo(f"Precompressed {written} file(s) in {manifest.root}")
+
+    return manifest
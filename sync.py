@@ -0,0 +1,354 @@
+"""離線客戶端增量同步
+
+下載：GET /api/v1/sync?since=<cursor> 依 (時間, 類型, id) 鍵集分頁，合併四個來源：
+住民（updated_at）、照護任務（updated_at）、照護計畫歷史（created_at，只新增）與刪除紀錄
+（sync_tombstone.deleted_at）。cursor 為上一頁最後一筆的鍵，不透明字串。
+已封存的照護計畫版本（見 archive.py）不在同步範圍內，完整同步只包含尚未封存的版本；
+封存門檻（CARE_PLAN_ARCHIVE_DAYS）遠長於刪除紀錄保存期限，增量同步的客戶端在封存前早已取得。
+客戶端需要舊版本時改用照護計畫歷史端點。
+
+交易可能晚於其時間戳記提交，每一頁的 cursor 都不會超過「現在 - SYNC_SAFETY_SECONDS」，
+這段時間內的資料會在下次同步重送，客戶端依 id 覆寫即可。since 早於刪除紀錄保存期限
+（SYNC_TOMBSTONE_RETENTION_DAYS）時回傳 reset，客戶端須清空本地資料後重新完整同步。
+
+上傳：POST /api/v1/sync 在單一交易中套用離線期間排隊的修改。修改與刪除須帶
+base_updated_at（客戶端取得該筆資料時的 updated_at），伺服器端已有較新的修改時回報衝突並略過。
+"""
+from datetime import datetime, timedelta
+
+import click
+from sqlalchemy import and_, insert, or_
+
+from archive import next_version
+from models import db, Resident, CareTask, CarePlanHistory, SyncTombstone
+
+EPOCH = datetime(1970, 1, 1)
+
+# 同一時間戳記下的排序，亦為 cursor 中的類型編號
+RESIDENT, CARE_TASK, CARE_PLAN_HISTORY, TOMBSTONE = range(4)
+
+RESIDENT_FIELDS = ('name', 'age', 'gender', 'room_number', 'emergency_contact_name',
+                   'emergency_contact_phone', 'medical_conditions', 'medications', 'care_notes')
+TASK_FIELDS = ('title', 'description', 'priority', 'status', 'assigned_to', 'notes')
+TASK_STATUSES = ('pending', 'in_progress', 'completed', 'cancelled')
+
+
+class SyncError(ValueError):
+    """單筆上傳修改無法套用"""
+
+    def __init__(self, reason, message, **details):
+        super().__init__(message)
+        self.reason = reason
+        self.details = details
+
+
+# --- Cursor ---
+
+def encode_cursor(key):
+    timestamp, kind, entity_id = key
+    micros = (timestamp - EPOCH) // timedelta(microseconds=1)
+    return f'{micros}.{kind}.{entity_id}'
+
+
+def decode_cursor(value):
+    """解析 cursor；格式錯誤時拋出 ValueError"""
+    if not value:
+        return None
+    micros, kind, entity_id = (int(part) for part in value.split('.'))
+    return EPOCH + timedelta(microseconds=micros), kind, entity_id
+
+
+def _after(column, id_column, kind, cursor):
+    """鍵集條件：(column, kind, id) > cursor"""
+    if cursor is None:
+        return True
+    timestamp, cursor_kind, cursor_id = cursor
+    if kind > cursor_kind:
+        return column >= timestamp
+    if kind < cursor_kind:
+        return column > timestamp
+    return or_(column > timestamp, and_(column == timestamp, id_column > cursor_id))
+
+
+# --- Download ---
+
+def _sources(owner_id, cursor, limit):
+    residents = Resident.query.filter(
+        Resident.owner_id == owner_id,
+        _after(Resident.updated_at, Resident.id, RESIDENT, cursor),
+    ).order_by(Resident.updated_at, Resident.id).limit(limit).all()
+
+    tasks = CareTask.query.join(Resident).filter(
+        Resident.owner_id == owner_id,
+        _after(CareTask.updated_at, CareTask.id, CARE_TASK, cursor),
+    ).order_by(CareTask.updated_at, CareTask.id).limit(limit).all()
+
+    histories = CarePlanHistory.query.join(Resident).filter(
+        Resident.owner_id == owner_id,
+        _after(CarePlanHistory.created_at, CarePlanHistory.id, CARE_PLAN_HISTORY, cursor),
+    ).order_by(CarePlanHistory.created_at, CarePlanHistory.id).limit(limit).all()
+
+    tombstones = SyncTombstone.query.filter(
+        SyncTombstone.owner_id == owner_id,
+        _after(SyncTombstone.deleted_at, SyncTombstone.id, TOMBSTONE, cursor),
+    ).order_by(SyncTombstone.deleted_at, SyncTombstone.id).limit(limit).all()
+
+    return (
+        [((r.updated_at or EPOCH, RESIDENT, r.id), r) for r in residents] +
+        [((t.updated_at or EPOCH, CARE_TASK, t.id), t) for t in tasks] +
+        [((h.created_at or EPOCH, CARE_PLAN_HISTORY, h.id), h) for h in histories] +
+        [((d.deleted_at, TOMBSTONE, d.id), d) for d in tombstones]
+    )
+
+
+def changes_since(owner_id, cursor, limit, safety_seconds, retention_days):
+    """返回一頁變更；cursor 為 decode_cursor() 的結果或 None（完整同步）"""
+    now = datetime.utcnow()
+    if cursor is not None and cursor[0] < now - timedelta(days=retention_days):
+        return {'reset': True, 'residents': [], 'care_tasks': [], 'care_plan_history': [],
+                'deleted': [], 'cursor': None, 'has_more': False}
+
+    # 每個來源各取 limit + 1 筆，合併後的前 limit 筆即為全域順序的下一頁
+    rows = sorted(_sources(owner_id, cursor, limit + 1), key=lambda item: item[0])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    buckets = {RESIDENT: [], CARE_TASK: [], CARE_PLAN_HISTORY: [], TOMBSTONE: []}
+    for key, obj in rows:
+        buckets[key[1]].append(obj.to_dict())
+
+    horizon = (now - timedelta(seconds=safety_seconds), -1, 0)
+    if has_more and rows[-1][0] < horizon:
+        next_cursor = rows[-1][0]
+    else:
+        # 每一頁的 cursor 都不超過安全時間點：之後的資料下次重送，避免漏掉較晚提交的交易。
+        # 安全時間點之前的資料都已在本頁，視為最後一頁，否則客戶端會反覆取得同一頁；
+        # 沒有變更的客戶端 cursor 也會前進，不會因超過保存期限而被要求重新同步
+        has_more = False
+        next_cursor = cursor if cursor is not None and cursor > horizon else horizon
+
+    return {
+        'reset': False,
+        'residents': buckets[RESIDENT],
+        'care_tasks': buckets[CARE_TASK],
+        'care_plan_history': buckets[CARE_PLAN_HISTORY],
+        'deleted': buckets[TOMBSTONE],
+        'cursor': encode_cursor(next_cursor),
+        'has_more': has_more,
+    }
+
+
+# --- Tombstones ---
+
+def record_tombstone(resident):
+    """刪除住民前呼叫，隨同一個交易提交；客戶端收到後一併刪除其任務與照護計畫"""
+    db.session.execute(insert(SyncTombstone.__table__), [{
+        'entity': 'resident',
+        'entity_id': resident.id,
+        'resident_id': resident.id,
+        'owner_id': resident.owner_id,
+        'deleted_at': datetime.utcnow(),
+    }])
+
+
+def prune_tombstones(retention_days):
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    deleted = db.session.execute(
+        SyncTombstone.__table__.delete().where(SyncTombstone.deleted_at < cutoff)
+    ).rowcount
+    db.session.commit()
+    return deleted
+
+
+# --- Upload ---
+
+def _parse_timestamp(value, field):
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+    except (AttributeError, ValueError):
+        raise SyncError('invalid', f'{field} must be an ISO 8601 timestamp')
+
+
+def _parse_date(value, fmt, field):
+    try:
+        return datetime.strptime(value, fmt)
+    except (TypeError, ValueError):
+        raise SyncError('invalid', f'{field} must match {fmt}')
+
+
+def _check_base(obj, change):
+    if 'base_updated_at' not in change:
+        raise SyncError('invalid', 'base_updated_at is required')
+    base = _parse_timestamp(change['base_updated_at'], 'base_updated_at')
+    if obj.updated_at and obj.updated_at > base:
+        raise SyncError('conflict', 'Modified on the server since base_updated_at', server=obj.to_dict())
+
+
+def _resident_values(data):
+    """先解析並驗證所有欄位，驗證失敗時不會留下修改到一半的物件"""
+    values = {field: data[field] for field in RESIDENT_FIELDS if field in data}
+    if 'admission_date' in data:
+        values['admission_date'] = (
+            _parse_date(data['admission_date'], '%Y-%m-%d', 'admission_date').date()
+            if data['admission_date'] else None
+        )
+    return values
+
+
+def _task_values(data, completed_at=None):
+    values = {field: data[field] for field in TASK_FIELDS if field in data}
+    if 'due_date' in data:
+        values['due_date'] = _parse_date(data['due_date'], '%Y-%m-%d %H:%M', 'due_date') if data['due_date'] else None
+    if 'status' in data:
+        if data['status'] not in TASK_STATUSES:
+            raise SyncError('invalid', f"status must be one of {', '.join(TASK_STATUSES)}")
+        if data['status'] == 'completed':
+            values['completed_at'] = completed_at or datetime.utcnow()
+        else:
+            values['completed_at'] = None
+    return values
+
+
+def _assign(obj, values):
+    for field, value in values.items():
+        setattr(obj, field, value)
+
+
+class UploadBatch:
+    """在同一個 session 中套用一批離線修改，client_id 可引用同批新增的住民"""
+
+    def __init__(self, owner_id):
+        self.owner_id = owner_id
+        self.created_residents = {}
+
+    def _resident(self, change):
+        if change.get('resident_client_id') is not None:
+            resident = self.created_residents.get(change['resident_client_id'])
+        else:
+            resident = self._owned(Resident, change.get('resident_id'))
+        if resident is None:
+            raise SyncError('not_found', 'Resident not found')
+        return resident
+
+    def _owned(self, model, entity_id):
+        if entity_id is None:
+            raise SyncError('invalid', 'id is required')
+        query = model.query.filter(model.id == entity_id)
+        if model is Resident:
+            obj = query.filter(Resident.owner_id == self.owner_id).first()
+        else:
+            obj = query.join(Resident).filter(Resident.owner_id == self.owner_id).first()
+        if obj is None:
+            raise SyncError('not_found', f'{model.__name__} not found')
+        return obj
+
+    def apply(self, change):
+        """套用一筆修改並返回受影響的物件；無法套用時拋出 SyncError"""
+        entity, op = change.get('entity'), change.get('op')
+        data = change.get('data') or {}
+        handler = self.HANDLERS.get((op, entity)) if isinstance(op, str) and isinstance(entity, str) else None
+        if handler is None or not isinstance(data, dict):
+            raise SyncError('invalid', f'Unsupported change: {op} {entity}')
+        return handler(self, change, data)
+
+    def _create_resident(self, change, data):
+        if not data.get('name'):
+            raise SyncError('invalid', 'Resident name is required')
+        resident = Resident(owner_id=self.owner_id, **_resident_values(data))
+        db.session.add(resident)
+        if change.get('client_id') is not None:
+            self.created_residents[change['client_id']] = resident
+        return resident
+
+    def _update_resident(self, change, data):
+        resident = self._owned(Resident, change.get('id'))
+        _check_base(resident, change)
+        _assign(resident, _resident_values(data))
+        resident.updated_at = datetime.utcnow()
+        return resident
+
+    def _delete_resident(self, change, data):
+        resident = self._owned(Resident, change.get('id'))
+        _check_base(resident, change)
+        record_tombstone(resident)
+        resident.soft_delete()
+        return resident
+
+    def _create_care_task(self, change, data):
+        if not data.get('title'):
+            raise SyncError('invalid', 'Task title is required')
+        values = dict({'priority': 'medium'}, **_task_values(data))
+        task = CareTask(resident=self._resident(change), **values)
+        db.session.add(task)
+        return task
+
+    def _update_care_task(self, change, data):
+        task = self._owned(CareTask, change.get('id'))
+        _check_base(task, change)
+        _assign(task, _task_values(data, task.completed_at))
+        task.updated_at = datetime.utcnow()
+        return task
+
+    def _create_care_plan(self, change, data):
+        # 照護計畫只新增版本，不會衝突
+        if not data.get('care_plan'):
+            raise SyncError('invalid', 'Care plan content is required')
+        resident = self._resident(change)
+        resident.current_care_plan = data['care_plan']
+        resident.updated_at = datetime.utcnow()
+        history = CarePlanHistory(
+            title=data.get('title') or f"離線更新照護計畫 - {datetime.now().strftime('%Y-%m-%d %H:%M')}",
+            content=data['care_plan'],
+            resident=resident,
+            version=next_version(resident.id),
+        )
+        db.session.add(history)
+        return history
+
+    HANDLERS = {
+        ('create', 'resident'): _create_resident,
+        ('update', 'resident'): _update_resident,
+        ('delete', 'resident'): _delete_resident,
+        ('create', 'care_task'): _create_care_task,
+        ('update', 'care_task'): _update_care_task,
+        ('create', 'care_plan'): _create_care_plan,
+    }
+
+
+def apply_changes(owner_id, changes):
+    """套用一批修改並提交；返回 (已套用, 衝突, 拒絕)"""
+    batch = UploadBatch(owner_id)
+    applied, conflicts, rejected = [], [], []
+    for index, change in enumerate(changes):
+        if not isinstance(change, dict):
+            rejected.append({'index': index, 'reason': 'invalid', 'message': 'Change must be an object'})
+            continue
+        ref = {'index': index, 'entity': change.get('entity'), 'op': change.get('op'),
+               'client_id': change.get('client_id'), 'id': change.get('id')}
+        try:
+            obj = batch.apply(change)
+        except SyncError as e:
+            entry = dict(ref, reason=e.reason, message=str(e), **e.details)
+            (conflicts if e.reason == 'conflict' else rejected).append(entry)
+            continue
+        # 逐筆 flush，讓後續修改能引用新 id；資料庫錯誤會使整批回滾
+        db.session.flush()
+        if ref['op'] != 'delete':
+            ref.update(id=obj.id, updated_at=getattr(obj, 'updated_at', None) or obj.created_at)
+        applied.append(ref)
+
+    db.session.commit()
+    return applied, conflicts, rejected
+
+
+def init_sync(app):
+    app.config.setdefault('SYNC_PAGE_SIZE', 500)
+    app.config.setdefault('SYNC_MAX_UPLOAD', 500)
+    app.config.setdefault('SYNC_SAFETY_SECONDS', 5)
+    app.config.setdefault('SYNC_TOMBSTONE_RETENTION_DAYS', 30)
+
+    @app.cli.command('prune-sync-tombstones')
+    def prune_sync_tombstones_command():
+        """刪除超過保存期限的同步刪除紀錄"""
+        deleted = prune_tombstones(app.config['SYNC_TOMBSTONE_RETENTION_DAYS'])
+        click.echo(f"Pruned {deleted} sync tombstone(s)")
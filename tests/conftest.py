@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path}/test.db')
+    monkeypatch.delenv('DATABASE_REPLICA_URL', raising=False)
+    from app import create_app
+    from models import db
+
+    app = create_app()
+    app.config.update(TESTING=True, SESSION_COOKIE_SECURE=False)
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    response = client.post('/api/v1/auth/register', json={'email': 'nurse@example.com', 'password': 'pw'})
+    assert response.status_code == 201
+    return client
@@ -0,0 +1,53 @@
+from analytics import NON_REBUILDABLE_METRICS, rebuild
+from models import AnalyticsCounter
+
+
+def snapshot(app):
+    with app.app_context():
+        return {
+            (row.scope, row.scope_id, row.period, row.metric): row.value
+            for row in AnalyticsCounter.query.all()
+            if row.value and row.metric not in NON_REBUILDABLE_METRICS
+        }
+
+
+def assert_matches_rebuild(app):
+    incremental = snapshot(app)
+    with app.app_context():
+        rebuild()
+    assert incremental == snapshot(app)
+
+
+def create_resident(client, name, tasks):
+    resident_id = client.post('/api/v1/residents', json={'name': name}).get_json()['data']['id']
+    response = client.post(f'/api/v1/residents/{resident_id}/tasks',
+                           json={'tasks': [{'title': title} for title in tasks]})
+    assert response.status_code == 201
+    client.post(f'/api/v1/residents/{resident_id}/care-plan', json={'care_plan': f'{name} plan'})
+    return resident_id
+
+
+def test_incremental_matches_rebuild_after_delete(app, client):
+    kept = create_resident(client, 'A', ['a1'])
+    deleted = create_resident(client, 'B', ['b1', 'b2'])
+    assert_matches_rebuild(app)
+
+    task_id = client.get(f'/api/v1/residents/{deleted}').get_json()['data']['care_tasks'][0]['id']
+    client.put(f'/api/v1/tasks/{task_id}', json={'status': 'completed'})
+    assert client.delete(f'/api/v1/residents/{deleted}').status_code == 200
+    assert_matches_rebuild(app)
+
+    facility = client.get('/api/v1/analytics/facility').get_json()['data']
+    assert facility['residents'] == 1
+    assert facility['tasks']['total'] == 1
+    assert sum(facility['monthly']['tasks_created'].values()) == 1
+    assert sum(facility['monthly']['care_plans'].values()) == 1
+    assert client.get(f'/api/v1/analytics/residents/{kept}').status_code == 200
+
+
+def test_incremental_matches_rebuild_after_reopening_task(app, client):
+    resident_id = create_resident(client, 'A', ['a1'])
+    task_id = client.get(f'/api/v1/residents/{resident_id}').get_json()['data']['care_tasks'][0]['id']
+    client.put(f'/api/v1/tasks/{task_id}', json={'status': 'completed'})
+    client.put(f'/api/v1/tasks/{task_id}', json={'status': 'pending'})
+    assert_matches_rebuild(app)
@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+
+from archive import archive_old_versions, get_history, list_history
+from models import db, CarePlanHistory, CarePlanArchive
+
+
+def save_versions(client, resident_id, contents):
+    for content in contents:
+        assert client.post(f'/api/v1/residents/{resident_id}/care-plan', json={'care_plan': content}).status_code == 200
+
+
+def age_all_history(days):
+    (db.session.query(CarePlanHistory).execution_options(include_deleted=True)
+     .update({'created_at': datetime.utcnow() - timedelta(days=days)}))
+    db.session.commit()
+
+
+def test_archives_old_versions_and_round_trips_content(app, client):
+    kept = client.post('/api/v1/residents', json={'name': 'A'}).get_json()['data']['id']
+    deleted = client.post('/api/v1/residents', json={'name': 'B'}).get_json()['data']['id']
+    contents = ['# 第一版\n\n- 每日量測血壓', '# 第二版\n\n- 注意跌倒風險', '# 第三版']
+    save_versions(client, kept, contents)
+    save_versions(client, deleted, ['b1', 'b2'])
+    assert client.delete(f'/api/v1/residents/{deleted}').status_code == 200
+
+    with app.app_context():
+        age_all_history(400)
+        assert archive_old_versions(180, batch_size=1) == 2
+
+        # 最新版本與已刪除住民的歷史不封存
+        hot = CarePlanHistory.query.execution_options(include_deleted=True).all()
+        assert sorted((row.resident_id, row.version) for row in hot) == [(kept, 3), (deleted, 1), (deleted, 2)]
+        archived = CarePlanArchive.query.filter_by(resident_id=kept).order_by(CarePlanArchive.version).all()
+        assert [row.version for row in archived] == [1, 2]
+
+        owner_id = archived[0].resident.owner_id
+        for row, content in zip(archived, contents):
+            assert get_history(row.id, owner_id)['content'] == content
+        assert get_history(archived[0].id, owner_id + 1) is None
+        assert [entry['version'] for entry in list_history(kept)] == [3, 2, 1]
+        assert archive_old_versions(180) == 0
+        archived_id = archived[0].id
+
+    detail = client.get(f'/api/v1/care-plan-history/{archived_id}').get_json()['data']
+    assert detail['content'] == contents[0] and detail['archived']
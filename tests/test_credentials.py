@@ -0,0 +1,70 @@
+import threading
+
+from werkzeug.security import generate_password_hash
+
+from credentials import PasswordHasher
+from models import db, User
+
+
+def add_user(app, email, password_hash, **fields):
+    with app.app_context():
+        db.session.add(User(email=email, password_hash=password_hash, **fields))
+        db.session.commit()
+
+
+def stored_hash(app, email):
+    with app.app_context():
+        return User.query.filter_by(email=email).first().password_hash
+
+
+def test_login_rehashes_outdated_hash(app):
+    add_user(app, 'old@example.com', generate_password_hash('pw', method='pbkdf2:sha256:1000'))
+    client = app.test_client()
+
+    response = client.post('/api/v1/auth/login', json={'email': 'old@example.com', 'password': 'pw'})
+    assert response.status_code == 200
+    method = app.extensions['credentials'].method
+    assert stored_hash(app, 'old@example.com').startswith(method + '$')
+
+    client.post('/api/v1/auth/logout')
+    assert client.post('/api/v1/auth/login', json={'email': 'old@example.com', 'password': 'pw'}).status_code == 200
+
+
+def test_wrong_password_does_not_rehash(app):
+    old = generate_password_hash('pw', method='pbkdf2:sha256:1000')
+    add_user(app, 'old@example.com', old)
+    response = app.test_client().post('/api/v1/auth/login', json={'email': 'old@example.com', 'password': 'x'})
+    assert response.status_code == 401
+    assert stored_hash(app, 'old@example.com') == old
+
+
+def test_google_only_account_cannot_log_in_with_password(app):
+    add_user(app, 'google@example.com', None, google_id='g-1', is_google_user=True)
+    response = app.test_client().post('/api/v1/auth/login', json={'email': 'google@example.com', 'password': 'pw'})
+    assert response.status_code == 401
+
+
+def test_saturated_pool_returns_503(app, client):
+    hasher = PasswordHasher(workers=1, queue_limit=0)
+    app.extensions['credentials'] = hasher
+    started, release = threading.Event(), threading.Event()
+
+    def hold():
+        started.set()
+        release.wait()
+
+    # 佔住唯一的名額
+    blocker = threading.Thread(target=hasher._run, args=(hold,))
+    blocker.start()
+    started.wait()
+    try:
+        response = client.post('/api/v1/auth/login', json={'email': 'nurse@example.com', 'password': 'pw'})
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
+        register = client.post('/api/v1/auth/register', json={'email': 'new@example.com', 'password': 'pw'})
+        assert register.status_code == 503
+    finally:
+        release.set()
+        blocker.join()
+    response = client.post('/api/v1/auth/login', json={'email': 'nurse@example.com', 'password': 'pw'})
+    assert response.status_code == 200
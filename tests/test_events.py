@@ -0,0 +1,59 @@
+from sqlalchemy import insert
+
+from events import ChangeFeed, Subscription
+from models import db, ChangeEvent
+
+
+def add_event(event_id, owner_id=1):
+    db.session.execute(insert(ChangeEvent.__table__), [{
+        'id': event_id, 'entity': 'resident', 'entity_id': event_id, 'action': 'updated',
+        'resident_id': event_id, 'owner_id': owner_id,
+    }])
+    db.session.commit()
+
+
+def drain(subscription):
+    ids = []
+    while not subscription.queue.empty():
+        ids.append(subscription.queue.get_nowait()['id'])
+    return ids
+
+
+def subscribed_feed():
+    # 不啟動背景執行緒，直接呼叫 _poll
+    feed = ChangeFeed()
+    subscription = Subscription(owner_id=1)
+    feed._subscriptions.add(subscription)
+    return feed, subscription
+
+
+def test_late_commit_below_last_id_is_delivered(app):
+    with app.app_context():
+        feed, subscription = subscribed_feed()
+        add_event(1)
+        add_event(3)
+        feed._poll()
+        assert drain(subscription) == [1, 3]
+        assert feed.last_id == 3 and set(feed.gaps) == {2}
+
+        # id 2 的交易在 3 之後才提交
+        add_event(2)
+        feed._poll()
+        assert drain(subscription) == [2]
+        assert not feed.gaps
+
+
+def test_gap_is_dropped_after_timeout(app):
+    with app.app_context():
+        feed, subscription = subscribed_feed()
+        add_event(1)
+        add_event(3)
+        feed._poll()
+        drain(subscription)
+
+        feed.gap_seconds = 0
+        feed._poll()
+        assert not feed.gaps
+        add_event(2)
+        feed._poll()
+        assert drain(subscription) == []
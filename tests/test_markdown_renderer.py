@@ -0,0 +1,77 @@
+import pytest
+
+import markdown_renderer
+from markdown_renderer import content_hash, render_markdown
+from models import db, RenderedMarkdown
+
+
+@pytest.fixture(autouse=True)
+def empty_memory_cache():
+    markdown_renderer._memory_cache.clear()
+    yield
+    markdown_renderer._memory_cache.clear()
+
+
+@pytest.mark.parametrize('text', [
+    '<script>alert(1)</script>',
+    'before <script>alert(1)</script> after',
+    '<img src="x" onerror="alert(1)">',
+    '<a href="#" onclick="alert(1)">x</a>',
+    '<div onmouseover="alert(1)">x</div>',
+])
+def test_raw_html_is_escaped(app, text):
+    with app.app_context():
+        html = render_markdown(text)
+    assert '<script' not in html and '<img' not in html and '<a ' not in html and '<div' not in html
+    assert '&lt;' in html
+
+
+@pytest.mark.parametrize('text', [
+    '[x](javascript:alert(1))',
+    '[x](JavaScript:alert(1))',
+    '[x](java\tscript:alert(1))',
+    '![x](javascript:alert(1))',
+    '[x](data:text/html;base64,PHNjcmlwdD4=)',
+    '[x]: javascript:alert(1)\n\n[y][x]',
+])
+def test_unsafe_links_are_stripped(app, text):
+    with app.app_context():
+        html = render_markdown(text)
+    assert 'javascript' not in html.lower() and 'data:' not in html
+
+
+def test_safe_links_are_kept(app):
+    with app.app_context():
+        html = render_markdown('[a](https://example.com) [b](/residents/1) [c](mailto:n@example.com)')
+    assert 'href="https://example.com"' in html
+    assert 'href="/residents/1"' in html
+    assert 'href="mailto:n@example.com"' in html
+
+
+def test_persisted_cache_is_used_and_keyed_on_content(app):
+    with app.app_context():
+        assert render_markdown('# 計畫') == '<h1>計畫</h1>'
+        row = db.session.get(RenderedMarkdown, content_hash('# 計畫'))
+        assert row is not None
+
+        # 行程內快取清空後改由資料庫快取取得
+        row.html = '<p>cached</p>'
+        db.session.commit()
+        markdown_renderer._memory_cache.clear()
+        assert render_markdown('# 計畫') == '<p>cached</p>'
+        # 行程內快取已記住資料庫的結果
+        assert markdown_renderer._memory_get(content_hash('# 計畫')) == '<p>cached</p>'
+
+        assert render_markdown('# 新計畫') == '<h1>新計畫</h1>'
+        assert content_hash('# 計畫') != content_hash('# 新計畫')
+
+
+def test_html_follows_content_changes(client):
+    resident_id = client.post('/api/v1/residents', json={'name': 'A'}).get_json()['data']['id']
+    url = f'/api/v1/residents/{resident_id}/care-plan'
+
+    client.post(url, json={'care_plan': '# 第一版'})
+    assert client.get(f'{url}?format=html').get_json()['data']['current_care_plan_html'] == '<h1>第一版</h1>'
+
+    client.post(url, json={'care_plan': '# 第二版'})
+    assert client.get(f'{url}?format=html').get_json()['data']['current_care_plan_html'] == '<h1>第二版</h1>'
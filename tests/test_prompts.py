@@ -0,0 +1,32 @@
+from prompts import PromptBuilder, fit, format_resident_context
+
+
+def test_non_string_resident_values_are_formatted():
+    context = format_resident_context({'name': '王', 'age': 85, 'medications': ['x', 'y'], 'medical_conditions': 3,
+                                       'care_notes': {'night': 'check'}})
+    assert "當前用藥：['x', 'y']" in context
+    assert '醫療狀況：3' in context
+    assert "照護備註：{'night': 'check'}" in context
+    assert fit(None, 10) == ''
+
+
+def test_section_accepts_non_string_values():
+    prompt = PromptBuilder().section('清單', ['a'], 50).section('數字', 0).section('空白', None).build()
+    assert "清單：\n['a']" in prompt
+    assert '數字：\n0' in prompt
+    assert '空白：\n無' in prompt
+
+
+def test_analyze_accepts_list_resident_info(client, monkeypatch):
+    prompts = []
+
+    def fake_deepseek(messages):
+        prompts.append(messages[-1]['content'])
+        return '分析結果'
+
+    monkeypatch.setattr('api.v1.endpoints.call_deepseek_api', fake_deepseek)
+    response = client.post('/api/v1/analyze', json={
+        'daily_log': '今日正常', 'resident_info': {'name': '王', 'medications': ['x', 'y']},
+    })
+    assert response.status_code == 200
+    assert "當前用藥：['x', 'y']" in prompts[0]
@@ -0,0 +1,49 @@
+from models import db, Resident, CareTask, ChangeEvent, SyncTombstone
+from purge import purge_batch, purge_deleted_residents
+
+
+def create_resident(client, name, task_count):
+    resident_id = client.post('/api/v1/residents', json={'name': name}).get_json()['data']['id']
+    client.post(f'/api/v1/residents/{resident_id}/tasks',
+                json={'tasks': [{'title': f'{name}-{index}'} for index in range(task_count)]})
+    return resident_id
+
+
+def count(model, **filters):
+    return model.query.execution_options(include_deleted=True).filter_by(**filters).count()
+
+
+def test_soft_deleted_resident_is_hidden(app, client):
+    kept = create_resident(client, 'A', 1)
+    deleted = create_resident(client, 'B', 2)
+    assert client.delete(f'/api/v1/residents/{deleted}').status_code == 200
+
+    assert client.get(f'/api/v1/residents/{deleted}').status_code == 404
+    assert [resident['id'] for resident in client.get('/api/v1/residents').get_json()['data']] == [kept]
+    with app.app_context():
+        assert [resident.id for resident in Resident.query.all()] == [kept]
+        # join 也會排除已刪除住民的子資料
+        assert {task.resident_id for task in CareTask.query.join(Resident).all()} == {kept}
+        assert count(Resident, id=deleted) == 1
+        assert count(CareTask, resident_id=deleted) == 2
+
+
+def test_purge_removes_children_in_batches(app, client):
+    kept = create_resident(client, 'A', 1)
+    deleted = create_resident(client, 'B', 5)
+    assert client.delete(f'/api/v1/residents/{deleted}').status_code == 200
+
+    with app.app_context():
+        assert purge_batch(2) == 2
+        assert count(CareTask, resident_id=deleted) == 3
+        assert count(Resident, id=deleted) == 1
+
+        purge_deleted_residents(batch_size=2)
+        assert count(Resident, id=deleted) == 0
+        assert count(CareTask, resident_id=deleted) == 0
+        assert count(CareTask, resident_id=kept) == 1
+        # 只保留刪除事件本身；同步刪除紀錄保留到保存期限
+        remaining = ChangeEvent.query.filter_by(resident_id=deleted).all()
+        assert [(event.entity, event.action) for event in remaining] == [('resident', 'deleted')]
+        assert count(SyncTombstone, resident_id=deleted) == 1
+        assert purge_batch(2) == 0
@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+
+from sync import decode_cursor
+
+
+def create_residents(client, count):
+    return [client.post('/api/v1/residents', json={'name': f'R{index}'}).get_json()['data']['id']
+            for index in range(count)]
+
+
+def download(client, since=None, limit=None):
+    params = {key: value for key, value in (('since', since), ('limit', limit)) if value is not None}
+    response = client.get('/api/v1/sync', query_string=params)
+    assert response.status_code == 200
+    return response.get_json()['data']
+
+
+def upload(client, *changes):
+    response = client.post('/api/v1/sync', json={'changes': list(changes)})
+    assert response.status_code == 200
+    return response.get_json()['data']
+
+
+def test_download_pages_through_all_changes(app, client):
+    app.config['SYNC_SAFETY_SECONDS'] = 0
+    ids = create_residents(client, 5)
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        page = download(client, cursor, limit=2)
+        seen += [resident['id'] for resident in page['residents']]
+        cursor, pages = page['cursor'], pages + 1
+        if not page['has_more']:
+            break
+    assert sorted(seen) == ids
+    assert pages == 3
+    assert download(client, cursor)['residents'] == []
+
+
+def test_cursor_never_passes_safety_horizon(app, client):
+    app.config['SYNC_SAFETY_SECONDS'] = 3600
+    ids = create_residents(client, 3)
+
+    # 全部資料都在安全時間內：本頁送出但 cursor 停在安全時間點，不再要求下一頁
+    page = download(client, limit=2)
+    assert len(page['residents']) == 2
+    assert not page['has_more']
+    assert decode_cursor(page['cursor'])[0] <= datetime.utcnow() - timedelta(seconds=3600)
+
+    # 下次同步重送這段時間內的資料
+    resent = download(client, page['cursor'], limit=10)
+    assert sorted(resident['id'] for resident in resent['residents']) == ids
+
+
+def test_deleted_resident_is_delivered_as_tombstone(app, client):
+    app.config['SYNC_SAFETY_SECONDS'] = 0
+    kept, deleted = create_residents(client, 2)
+    cursor = download(client)['cursor']
+
+    assert client.delete(f'/api/v1/residents/{deleted}').status_code == 200
+    page = download(client, cursor)
+    assert [(entry['entity'], entry['id']) for entry in page['deleted']] == [('resident', deleted)]
+    assert all(resident['id'] != deleted for resident in page['residents'])
+    assert [resident['id'] for resident in download(client)['residents']] == [kept]
+
+
+def test_upload_checks_base_updated_at(app, client):
+    resident_id = create_residents(client, 1)[0]
+    current = client.get(f'/api/v1/residents/{resident_id}').get_json()['data']['updated_at']
+
+    result = upload(client, {'op': 'update', 'entity': 'resident', 'id': resident_id,
+                             'base_updated_at': current, 'data': {'room_number': '101'}})
+    assert [entry['id'] for entry in result['applied']] == [resident_id]
+    assert not result['conflicts'] and not result['rejected']
+
+    # 以舊的 base_updated_at 修改：伺服器已有較新的修改
+    stale = upload(client, {'op': 'update', 'entity': 'resident', 'id': resident_id,
+                            'base_updated_at': current, 'data': {'room_number': '102'}})
+    assert not stale['applied']
+    assert stale['conflicts'][0]['reason'] == 'conflict'
+    assert stale['conflicts'][0]['server']['room_number'] == '101'
+
+    # 缺少 base_updated_at 時拒絕，不套用
+    missing = upload(client, {'op': 'update', 'entity': 'resident', 'id': resident_id,
+                              'data': {'room_number': '103'}},
+                     {'op': 'delete', 'entity': 'resident', 'id': resident_id, 'base_updated_at': 'yesterday'})
+    assert not missing['applied'] and not missing['conflicts']
+    assert [entry['reason'] for entry in missing['rejected']] == ['invalid', 'invalid']
+    assert client.get(f'/api/v1/residents/{resident_id}').get_json()['data']['room_number'] == '101'